@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+import os
+import shutil
+import threading
+import uuid
+
+scratch_prefix = "job-"  # Scratch directories of jobs in the scratch root, other entries are never touched
+trash_suffix = ".trash"
+
+
+def disk_free(path):
+    # Free bytes of the filesystem of path
+    return shutil.disk_usage(path).free
+
+
+def memory_total():
+    # Physical memory in bytes, None if the platform does not tell
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class Budget:
+    """
+    Disk and memory budget of the jobs on this machine, in bytes. A job is admitted when its estimated
+    footprint fits what the running jobs leave, otherwise it waits until enough is released.
+    Jobs are admitted in arrival order, so a large video is not starved by smaller ones behind it.
+    A job larger than the whole budget runs alone.
+    """
+    def __init__(self, disk, memory):
+        self.disk = disk
+        self.memory = memory
+        self.free_disk = disk
+        self.free_memory = memory
+        self.cond = threading.Condition()
+        self.tickets = 0  # Next arrival
+        self.serving = 0  # Arrival admitted next
+
+    @contextmanager
+    def admit(self, name, disk, memory):
+        disk = min(disk, self.disk)
+        memory = min(memory, self.memory)
+        with self.cond:
+            ticket = self.tickets
+            self.tickets += 1
+            waited = False
+            while ticket != self.serving or disk > self.free_disk or memory > self.free_memory:
+                if not waited and ticket == self.serving:
+                    print(f"Wait for budget of {name}: disk {disk / 1048576:.0f} MB, memory {memory / 1048576:.0f} MB")
+                    waited = True
+                self.cond.wait()
+            self.serving += 1
+            self.free_disk -= disk
+            self.free_memory -= memory
+            self.cond.notify_all()  # The next arrival may fit too
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.free_disk += disk
+                self.free_memory += memory
+                self.cond.notify_all()
+
+
+def make_scratch(root, name):
+    # New empty directory of one job in root, unique even if the same video runs twice
+    path = os.path.join(root, f"{scratch_prefix}{name}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(path)
+    return path
+
+
+def remove_scratch(path):
+    # Rename first so the directory disappears at once, then delete its files
+    trash = path + trash_suffix
+    try:
+        os.rename(path, trash)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def clean_stale(root):
+    # Scratch directories left by a run that crashed
+    if not os.path.isdir(root):
+        return
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if entry.startswith(scratch_prefix) and os.path.isdir(path):
+            print("Remove stale scratch directory:", path)
+            if entry.endswith(trash_suffix):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                remove_scratch(path)
@@ -0,0 +1,47 @@
+from ffmpy import FFmpeg, FFprobe
+import json
+import re
+from subprocess import PIPE
+
+
+def get_duration(filename):
+    # Duration in seconds of the media file
+    fr = FFprobe(global_options='-of json -show_format',
+                 inputs={filename: None}
+                 )
+    print(fr.cmd)
+    res = fr.run(stdout=PIPE, stderr=PIPE)
+    return float(json.loads(res[0]).get('format')['duration'])
+
+
+def detect_silence(filename, noise="-35dB", min_silence=0.4):
+    """
+    Find silence gaps in the audio track with ffmpeg silencedetect filter
+    Return list of (silence_start, silence_end) in seconds
+    """
+    ff = FFmpeg(inputs={filename: None},
+                outputs={'-': f"-vn -af silencedetect=noise={noise}:d={min_silence} -f null"}
+                )
+    print(ff.cmd)
+    res = ff.run(stdout=PIPE, stderr=PIPE)
+    log = res[1].decode("utf8", errors="ignore")
+    starts = [max(float(t), 0) for t in re.findall(r"silence_start: (-?[\d.]+)", log)]
+    ends = [float(t) for t in re.findall(r"silence_end: ([\d.]+)", log)]
+    return list(zip(starts, ends))
+
+
+def split_chunks(duration, silences, max_time):
+    """
+    Split the timeline into chunks no longer than max_time seconds.
+    Cut at the middle of the last silence gap in the second half of each chunk,
+    if there is no silence gap there, cut at max_time.
+    Return list of (start, end) in seconds
+    """
+    gaps = [(s + e) / 2 for s, e in silences]
+    cuts = [0.0]
+    while duration - cuts[-1] > max_time:
+        limit = cuts[-1] + max_time
+        candidates = [g for g in gaps if cuts[-1] + max_time / 2 < g <= limit]
+        cuts.append(candidates[-1] if candidates else limit)
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
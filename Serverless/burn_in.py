@@ -0,0 +1,205 @@
+from ffmpy import FFmpeg, FFprobe
+from concurrent import futures
+import bisect
+import itertools
+import json
+import os
+import threading
+from subprocess import PIPE
+
+from audio_chunks import get_duration
+
+stats = {}  # Burn profile: [seconds of video, seconds of wall time x cores]
+stats_lock = threading.Lock()
+# Encoder of smart render for the codec of the source, re-encoded GOPs must match the copied ones
+smart_encoders = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "vp9": "libvpx-vp9"
+}
+# CRF of about the same quality on the scale of each encoder, when smart render changes the encoder of the profile
+smart_crf = {
+    "libx264": 23,
+    "libx265": 28,
+    "libvpx-vp9": 32
+}
+
+
+def encoder_threads(jobs, workers=1):
+    # Threads per ffmpeg so that jobs videos, each with workers encoders, together use about all cores
+    return max(1, os.cpu_count() // max(1, jobs * workers))
+
+
+def encode_options(profile, threads):
+    # Video encoder options of a burn profile, audio is always stream copied
+    options = f"-c:v {profile['codec']}"
+    if profile["preset"]:
+        options += f" -preset {profile['preset']}"
+    if profile["crf"] is not None:
+        options += f" -crf {profile['crf']}"
+        if profile["codec"] == "libvpx-vp9":
+            options += " -b:v 0"  # Constant quality mode of vp9
+    return options + f" -threads {threads}"
+
+
+def subtitle_filter(sub_file, style):
+    # subtitles filter reads srt and ass, style overrides the ASS style e.g. Fontsize=24,Outline=1
+    if style:
+        return f"-vf \"subtitles={sub_file}:force_style='{style}'\""
+    return f"-vf subtitles={sub_file}"
+
+
+def record(profile_name, video_seconds, wall_seconds, cores):
+    with stats_lock:
+        total = stats.setdefault(profile_name, [0.0, 0.0])
+        total[0] += video_seconds
+        total[1] += wall_seconds * cores
+
+
+def report():
+    # Throughput per core of each burn profile in this run
+    for profile_name, (video_seconds, core_seconds) in stats.items():
+        if core_seconds > 0:
+            print(f"Burn-in profile {profile_name}: {video_seconds:.0f} seconds of video, "
+                  f"{video_seconds / core_seconds:.3f} seconds of video per core second")
+
+
+def start_time(source):
+    # Start time in seconds of the file, input -ss is relative to it
+    fr = FFprobe(global_options="-v error -show_entries format=start_time -of csv=p=0",
+                 inputs={source: None}
+                 )
+    print(fr.cmd)
+    res = fr.run(stdout=PIPE, stderr=PIPE)
+    value = res[0].decode("utf8", errors="ignore").strip()
+    return float(value) if value not in ("", "N/A") else 0.0
+
+
+def keyframes(source):
+    # Keyframe times in seconds of the first video stream from the start of the file,
+    # read from packet flags without decoding
+    fr = FFprobe(global_options="-v error -select_streams v:0 -show_entries packet=pts_time,flags -of csv=p=0",
+                 inputs={source: None}
+                 )
+    print(fr.cmd)
+    res = fr.run(stdout=PIPE, stderr=PIPE)
+    offset = start_time(source)
+    times = []
+    for line in res[0].decode("utf8", errors="ignore").splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts) - offset)
+    return sorted(times)
+
+
+def video_stream(source):
+    # codec_name and pix_fmt of the first video stream
+    fr = FFprobe(global_options="-v error -select_streams v:0 -show_entries stream=codec_name,pix_fmt -of json",
+                 inputs={source: None}
+                 )
+    print(fr.cmd)
+    res = fr.run(stdout=PIPE, stderr=PIPE)
+    streams = json.loads(res[0]).get("streams", [])
+    return streams[0] if streams else {}
+
+
+def smart_segments(duration, keys, lang_subs, cuts):
+    """
+    Split the timeline at keyframes into GOPs, a GOP is re-encoded if any cue overlaps it, otherwise copied.
+    Neighbor GOPs of the same kind are merged, but not across cuts, so long runs are still split for the workers.
+    Return list of (start, end, encode) in seconds
+    """
+    bounds = [0.0] + [k for k in keys if 0 < k < duration] + [duration]
+    # Cues in start order with the max end of all cues starting before them
+    order = sorted(range(len(lang_subs)), key=lambda i: lang_subs.starts[i])
+    starts = [lang_subs.starts[i] / 1000 for i in order]
+    max_ends = list(itertools.accumulate((lang_subs.ends[i] / 1000 for i in order), max))
+    cut_set = set(cuts)
+
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        j = bisect.bisect_left(starts, end)  # Cues starting before the end of the GOP
+        encode = j > 0 and max_ends[j - 1] > start
+        if segments and segments[-1][2] == encode and start not in cut_set:
+            segments[-1] = (segments[-1][0], end, encode)
+        else:
+            segments.append((start, end, encode))
+    return segments
+
+
+def split_segments(duration, keys, count):
+    """
+    Split the timeline into count segments of about the same length,
+    each cut at the first keyframe at or after i * duration / count.
+    Return list of (start, end) in seconds
+    """
+    cuts = [0.0]
+    for i in range(1, count):
+        k = bisect.bisect_left(keys, duration * i / count)
+        if k < len(keys) and cuts[-1] < keys[k] < duration:
+            cuts.append(keys[k])
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def burn_segment(source, start, end, seg_file, video_options):
+    # Worker thread: burn the ass of one segment into its video with its own ffmpeg, or copy it,
+    # audio is added back when concatenating
+    # Cuts are keyframe times in microseconds, the precision of ffmpeg timestamps, so a copy starts at that keyframe
+    # and not at the one before, which rounding to milliseconds can give with 29.97 fps
+    ff = FFmpeg(global_options="-loglevel error",
+                inputs={source: f"-ss {start:.6f} -t {end - start:.6f}"},
+                outputs={seg_file: f"-y -an {video_options}"}
+                )
+    print(ff.cmd)
+    ff.run()
+    return seg_file
+
+
+def burn_segments(source, lang_subs, out_file, lang, ext, count, workers, options="", style=None, smart=None):
+    """
+    Burn lang_subs (CueList) into the video in count segments split at keyframes, each by its own ffmpeg in parallel.
+    Worker threads only wait on ffmpeg, forking processes from this multi-threaded process with live gRPC
+    channels of the API clients could hang.
+    Each segment gets the cues of its time slice shifted to its local time.
+    options: encoder options of each segment, style: force_style of the subtitles
+    smart: video_stream of the source for smart render, only GOPs overlapping a cue are re-encoded
+        with the encoder of the source codec, the others are stream copied. options must use that encoder.
+    Return the concat list file of the segments, to join them with the concat demuxer without re-encoding,
+    and the duration of the video
+    """
+    duration = get_duration(source)
+    keys = keyframes(source)
+    cuts = split_segments(duration, keys, max(count, 1))
+    if smart:
+        segments = smart_segments(duration, keys, lang_subs, [start for start, end in cuts])
+        encoded = sum(end - start for start, end, encode in segments if encode)
+        print(f"Smart render {lang}: re-encode {encoded:.0f} of {duration:.0f} seconds in "
+              f"{sum(1 for segment in segments if segment[2])} of {len(segments)} segments: {source}")
+        if smart["codec_name"] in ("h264", "hevc"):
+            ext = ".ts"  # Parameter sets in-band in every segment, so copied and encoded GOPs join cleanly
+    else:
+        segments = [(start, end, True) for start, end in cuts]
+    print(f"Burn subtitles of {lang} in {len(segments)} segments with {workers} workers: {source}")
+    seg_files = []
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for i, (start, end, encode) in enumerate(segments):
+            seg_file = f"{out_file}.{lang}.seg{i:03d}{ext}"
+            if encode:
+                ass_file = f"{out_file}.{lang}.seg{i:03d}.ass"
+                with open(ass_file, "w", encoding="utf8") as f:
+                    lang_subs.shifted(round(start * 1000), round(end * 1000)).write_formats({"ass": f}, lang)
+                video_options = f"{subtitle_filter(ass_file, style)} {options}"
+            else:
+                video_options = "-c:v copy"
+            jobs.append(pool.submit(burn_segment, source, start, end, seg_file, video_options))
+            seg_files.append(seg_file)
+        for job in jobs:
+            job.result()
+
+    list_file = f"{out_file}.{lang}.concat.txt"
+    with open(list_file, "w", encoding="utf8") as f:
+        for seg_file in seg_files:
+            f.write(f"file '{os.path.abspath(seg_file)}'\n")
+    return list_file, duration
@@ -0,0 +1,88 @@
+import asyncio
+import contextlib
+import threading
+from concurrent import futures
+
+poll_initial = 5.0  # Seconds before the first poll of an operation
+poll_max = 60.0  # Max seconds between two polls
+poll_multiplier = 1.5
+engine = None
+cpu_slots = None  # Semaphore of jobs doing local work, None means no limit
+slot_holder = threading.local()
+
+
+class LroMultiplexer:
+    """
+    Wait for Speech and Translate long running operations from one asyncio event loop.
+    Each waiting operation is a sleeping coroutine polled with exponential backoff,
+    the short get_operation calls run on a small poll thread pool.
+    """
+    def __init__(self, poll_threads=4):
+        self.loop = asyncio.new_event_loop()
+        self.poll_pool = futures.ThreadPoolExecutor(max_workers=poll_threads)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    async def poll(self, operation, timeout=None):
+        delay = poll_initial
+        deadline = self.loop.time() + timeout if timeout else None
+        while True:
+            await asyncio.sleep(delay)
+            if await self.loop.run_in_executor(self.poll_pool, operation.done):
+                return
+            if deadline and self.loop.time() + delay > deadline:
+                raise TimeoutError(f"Operation did not complete within {timeout} seconds")
+            delay = min(delay * poll_multiplier, poll_max)
+
+    def wait(self, operation, timeout=None):
+        # Block the calling job until the operation is done, its cpu slot is free for other jobs meanwhile
+        future = asyncio.run_coroutine_threadsafe(self.poll(operation, timeout), self.loop)
+        with released_slot():
+            future.result()
+        return operation.result()
+
+
+def start(cpu_threads, poll_threads=4):
+    """
+    Start the multiplexer. Jobs in job_slot() do local work at most cpu_threads at a time,
+    and any number of jobs can wait for remote operations.
+    """
+    global engine, cpu_slots
+    cpu_slots = threading.Semaphore(cpu_threads)
+    engine = LroMultiplexer(poll_threads)
+
+
+def wait(operation, timeout=None):
+    # Result of long running operation, through the multiplexer if started
+    if engine is None:
+        return operation.result(timeout=timeout)
+    return engine.wait(operation, timeout)
+
+
+@contextlib.contextmanager
+def job_slot():
+    # Hold a cpu slot for the job running in this thread
+    if cpu_slots is None:
+        yield
+        return
+    cpu_slots.acquire()
+    slot_holder.held = True
+    try:
+        yield
+    finally:
+        slot_holder.held = False
+        cpu_slots.release()
+
+
+@contextlib.contextmanager
+def released_slot():
+    # Give back the cpu slot of this thread while waiting for remote work
+    held = getattr(slot_holder, "held", False)
+    if held:
+        slot_holder.held = False
+        cpu_slots.release()
+    try:
+        yield
+    finally:
+        if held:
+            cpu_slots.acquire()
+            slot_holder.held = True
@@ -1,29 +1,50 @@
 from google.cloud import translate
+from google.cloud.translate_v3.services.translation_service.transports import TranslationServiceGrpcTransport
+import grpc
+import os
+import functools
 import time
 import datetime
 
+import lro_engine
+
+online_max_chars = 25000  # Characters per translate_text request, the API limit is 30k codepoints
+online_max_lines = 1000  # Lines per translate_text request, the API limit is 1024
+
+
+@functools.lru_cache(maxsize=None)
+def translate_client():
+    # One client per process, its gRPC channel stays warm and is shared by all threads
+    # TRANSLATE_EMULATOR_HOST points the client to a local fake server without TLS, e.g. localhost:8086
+    host = os.environ.get("TRANSLATE_EMULATOR_HOST")
+    if host:
+        return translate.TranslationServiceClient(
+            transport=TranslationServiceGrpcTransport(channel=grpc.insecure_channel(host)))
+    return translate.TranslationServiceClient()
+
 
 def batch_translate_text(
     input_uri, output_uri_prefix, project_id, location, source_lang, target_lang
 ):
     """
     Example:
-    input_uri: "gs://tempbucket/pfe/pfe.en-US.txt"
+    input_uri: "gs://tempbucket/pfe/pfe.en-US.txt", or list of up to 100 files translated in one operation
     output_uri_prefix: "gs://tempbucket/pfe-translated/"
     project_id: myproject_id
     location: us-central1  # global location is not supported by batch translate api
     source_lang: en
-    target_lang: zn
+    target_lang: zn, or list of up to 10 languages, e.g. ["zh", "ja"]
         # Translate language code: https://cloud.google.com/translate/docs/languages
     """
     start_time = datetime.datetime.now()
     # call batch translate against orig.txt
-    client = translate.TranslationServiceClient()
-    gcs_source = {"input_uri": input_uri}
-    input_configs_element = {"gcs_source": gcs_source, "mime_type": "text/plain"}
+    client = translate_client()
+    input_uris = input_uri if isinstance(input_uri, list) else [input_uri]
+    input_configs = [{"gcs_source": {"input_uri": uri}, "mime_type": "text/plain"} for uri in input_uris]
     gcs_destination = {"output_uri_prefix": output_uri_prefix}
     output_config = {"gcs_destination": gcs_destination}
     parent = f"projects/{project_id}/locations/{location}"
+    target_langs = target_lang if isinstance(target_lang, list) else [target_lang]
 
     try:
         print("Translating...", input_uri)
@@ -31,13 +52,13 @@ def batch_translate_text(
             request={
                 "parent": parent,  # Required para
                 "source_language_code": source_lang,
-                "target_language_codes": [target_lang],  # Up to 10 language codes here.
-                "input_configs": [input_configs_element],
+                "target_language_codes": target_langs,  # Up to 10 language codes here.
+                "input_configs": input_configs,  # Up to 100 input files here.
                 "output_config": output_config,
             }
         )
 
-        response = operation.result(timeout=3600)
+        response = lro_engine.wait(operation, 3600)
         spent_time = str(datetime.datetime.now() - start_time)
         print(f"Translated Time: {spent_time}", input_uri, "Total Characters: {}".format(response.total_characters), u"Translated: {}".format(response.translated_characters))
     except Exception as e:
@@ -45,3 +66,45 @@ def batch_translate_text(
         return "ERR"
     return
 
+
+
+def translate_lines(lines, project_id, source_lang, target_lang, location="global"):
+    """
+    Translate lines in memory with the online translate_text API in one request
+    Return translated lines in the same order
+    """
+    client = translate_client()
+    response = client.translate_text(
+        request={
+            "parent": f"projects/{project_id}/locations/{location}",
+            "contents": lines,
+            "mime_type": "text/plain",
+            "source_language_code": source_lang,
+            "target_language_code": target_lang,
+        }
+    )
+    return [t.translated_text for t in response.translations]
+
+
+def online_translate_text(lines, project_id, source_lang, target_lang, location="global"):
+    """
+    Translate lines of a short transcript in memory with translate_text,
+    in requests of up to online_max_chars characters and online_max_lines lines
+    Return translated lines in the same order
+    """
+    translated = []
+    batch = []
+    batch_chars = 0
+    try:
+        for line in lines + [None]:
+            if batch and (line is None or batch_chars + len(line) > online_max_chars or len(batch) >= online_max_lines):
+                translated += translate_lines(batch, project_id, source_lang, target_lang, location)
+                batch = []
+                batch_chars = 0
+            if line is not None:
+                batch.append(line)
+                batch_chars += len(line)
+    except Exception as e:
+        print(f"ERROR while online translating to {target_lang}: ", e)
+        return "ERR"
+    return translated
@@ -0,0 +1,160 @@
+from concurrent import futures
+from google.api_core.exceptions import NotFound, PreconditionFailed
+import json
+import threading
+import time
+import uuid
+
+import lro_engine
+
+staging_grace = 5  # Seconds after the window for late registrations to land in GCS
+staging_timeout = 3900  # Max seconds a follower waits for the result of the leader
+
+
+class LocalBatcher:
+    """
+    Collect transcripts that are ready to translate in this process, within window seconds or up to max_inputs,
+    and translate them in one batch operation with submit(input_uris, batch_id).
+    submit returns the output folder in gs://tmp, or "ERR".
+    """
+    def __init__(self, submit, window=30, max_inputs=100):
+        self.submit = submit
+        self.window = window
+        self.max_inputs = max_inputs
+        self.lock = threading.Lock()
+        self.pending = []  # (input_uri, future)
+        self.timer = None
+
+    def translate(self, input_uri):
+        # Block until the batch containing input_uri is translated, return its output folder or "ERR"
+        future = futures.Future()
+        batch = None
+        with self.lock:
+            self.pending.append((input_uri, future))
+            if len(self.pending) >= self.max_inputs:
+                batch = self.take()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if batch:
+            threading.Thread(target=self.run, args=(batch,), daemon=True).start()
+        with lro_engine.released_slot():
+            return future.result()
+
+    def take(self):
+        batch = self.pending
+        self.pending = []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def flush(self):
+        with self.lock:
+            batch = self.take()
+        if batch:
+            self.run(batch)
+
+    def run(self, batch):
+        print(f"Translate batch of {len(batch)} transcripts")
+        try:
+            folder = self.submit([input_uri for input_uri, future in batch], uuid.uuid4().hex[:12])
+        except Exception as e:
+            print("ERROR while translate batch: ", e)
+            folder = "ERR"
+        for input_uri, future in batch:
+            future.set_result(folder)
+
+
+class GcsBatcher:
+    """
+    Share batch translate operations between Cloud Run instances through a staging folder in gs://tmp.
+    Each event registers its input in the folder of the current time window. The first to create the leader
+    object of the window submits all registered inputs after the window closes and writes result.json,
+    the others wait for it. Inputs missing from the result are translated on their own.
+    Each event deletes its input once it has the result, and the leader deletes the folder when no input is left.
+    """
+    def __init__(self, storage_client, bucket, submit, window=30, max_inputs=100, prefix="translate-staging/"):
+        self.bucket = storage_client.bucket(bucket)
+        self.storage_client = storage_client
+        self.submit = submit
+        self.window = window
+        self.max_inputs = max_inputs
+        self.prefix = prefix
+
+    def translate(self, input_uri):
+        slot = int(time.time() // self.window)
+        folder = f"{self.prefix}{slot}/"
+        registration = self.bucket.blob(f"{folder}inputs/{uuid.uuid4().hex}")
+        registration.upload_from_string(input_uri)
+        try:
+            self.bucket.blob(f"{folder}leader").upload_from_string(input_uri, if_generation_match=0)
+            leader = True
+        except PreconditionFailed:
+            leader = False
+        time.sleep(max((slot + 1) * self.window + staging_grace - time.time(), 0))
+
+        if leader:
+            result = self.lead(folder, slot)
+        else:
+            result = self.follow(folder)
+        delete_quietly(registration)
+        if leader:
+            threading.Thread(target=self.cleanup, args=(folder, slot), daemon=True).start()
+        if input_uri in result:
+            return result[input_uri]
+        print("Translate on its own, not in the shared batch:", input_uri)
+        return self.submit([input_uri], uuid.uuid4().hex[:12])
+
+    def lead(self, folder, slot):
+        inputs = [b.download_as_text() for b in self.storage_client.list_blobs(self.bucket, prefix=f"{folder}inputs/")]
+        print(f"Translate shared batch of {len(inputs)} transcripts, window {slot}")
+        result = {}
+        for i in range(0, len(inputs), self.max_inputs):
+            batch = inputs[i:i + self.max_inputs]
+            try:
+                out_folder = self.submit(batch, f"{slot}-{i // self.max_inputs}")
+            except Exception as e:
+                print("ERROR while translate batch: ", e)
+                out_folder = "ERR"
+            result.update({input_uri: out_folder for input_uri in batch})
+        self.bucket.blob(f"{folder}result.json").upload_from_string(json.dumps(result))
+        return result
+
+    def cleanup(self, folder, slot):
+        """
+        Delete the staging folder once every event of the window has read result.json and deleted its input,
+        and folders of windows older than staging_timeout, left by instances that stopped while waiting
+        """
+        deadline = time.time() + staging_timeout
+        delay = lro_engine.poll_initial
+        while time.time() < deadline and list(self.storage_client.list_blobs(self.bucket, prefix=f"{folder}inputs/",
+                                                                              max_results=1)):
+            time.sleep(delay)
+            delay = min(delay * lro_engine.poll_multiplier, lro_engine.poll_max)
+        oldest = slot - staging_timeout // self.window - 1
+        for blob in self.storage_client.list_blobs(self.bucket, prefix=self.prefix):
+            window = blob.name[len(self.prefix):].split("/", 1)[0]
+            if blob.name.startswith(folder) or (window.isdigit() and int(window) < oldest):
+                delete_quietly(blob)
+
+    def follow(self, folder):
+        blob = self.bucket.blob(f"{folder}result.json")
+        deadline = time.time() + staging_timeout
+        delay = lro_engine.poll_initial
+        while time.time() < deadline:
+            if blob.exists():
+                return json.loads(blob.download_as_text())
+            time.sleep(delay)
+            delay = min(delay * lro_engine.poll_multiplier, lro_engine.poll_max)
+        print("ERROR while waiting for shared translate batch:", folder)
+        return {}
+
+
+def delete_quietly(blob):
+    # Staging objects may be deleted by another instance at the same time
+    try:
+        blob.delete()
+    except NotFound:
+        pass
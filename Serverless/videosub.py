@@ -1,29 +1,140 @@
 from google.cloud import storage
+from google.api_core.exceptions import Conflict, NotFound
 from ffmpy import FFmpeg, FFprobe
+import hashlib
 import json
 import os
 import re
 import sys
 import platform
 from concurrent import futures
+from contextlib import nullcontext
 from subprocess import PIPE
-
-from speech2txt import speech2txt
-from translate import batch_translate_text
-from txt2srt import txt2srt
+import datetime
+import threading
+import time
+
+from speech2txt import speech2txt, recognize_results, stitch_results
+from audio_chunks import get_duration, detect_silence, split_chunks
+from remote_input import remote_url
+import admission
+import artifact_cache
+import bulk
+import lro_engine
+import cues
+import burn_in
+import transfer
+from ingest_manifest import Manifest
+import job_state
+import translation_memory
+from live_subs import live_recognize
+from translate import batch_translate_text, online_translate_text
+from translate_batcher import LocalBatcher, GcsBatcher
+from txt2srt import txt2srt, load_srt
 import argparse
 
 support_format = [".mov", ".mp4", ".mkv", ".avi", ".webm", ".flac"]
 storage_client = storage.Client()
 project_id = storage_client.project
 translate_location = "us-central1"
-global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_code, merge_sub_to_video, two_step_convert, parallel_threads, local_file
-
-def audio_to_file(filename, filename_audio):
+stream_upload = False
+stream_chunk_size = 8 * 1024 * 1024  # Resumable upload chunk, must be a multiple of 256 KB
+# Container options to let ffmpeg write the burned video to a non-seekable pipe
+stream_formats = {
+    ".mp4": "-f mp4 -movflags frag_keyframe+empty_moov",
+    ".mov": "-f mov -movflags frag_keyframe+empty_moov",
+    ".mkv": "-f matroska",
+    ".webm": "-f webm",
+    ".avi": "-f avi"
+}
+# Audio extraction profiles for Speech-to-Text. encoding, sample_rate and channels are sent in RecognitionConfig,
+# None means keep the source value and detect it with ffprobe.
+# Supported encoding: https://cloud.google.com/speech-to-text/docs/encoding#audio-encodings
+audio_profiles = {
+    "source": {"ext": ".flac", "format": "flac", "options": "", "encoding": "FLAC",
+               "sample_rate": None, "channels": None},
+    "flac16k": {"ext": ".flac", "format": "flac", "options": "-ac 1 -ar 16000", "encoding": "FLAC",
+                "sample_rate": 16000, "channels": 1},
+    "opus16k": {"ext": ".ogg", "format": "ogg", "options": "-ac 1 -ar 16000 -c:a libopus -b:a 32k -application voip",
+                "encoding": "OGG_OPUS", "sample_rate": 16000, "channels": 1}
+}
+audio_profile = "flac16k"
+# Encoding profiles of hard burn-in. threads 0 means sharing the cores among parallel ffmpeg,
+# style is the force_style of the subtitles. Audio is always stream copied.
+burn_profiles = {
+    "default": {"codec": "libx264", "preset": "medium", "crf": 23, "threads": 0, "style": "Fontsize=24"},
+    "fast": {"codec": "libx264", "preset": "veryfast", "crf": 23, "threads": 0, "style": "Fontsize=24"},
+    "quality": {"codec": "libx264", "preset": "slow", "crf": 18, "threads": 0, "style": "Fontsize=24"},
+    "hevc": {"codec": "libx265", "preset": "medium", "crf": 28, "threads": 0, "style": "Fontsize=24"},
+    "vp9": {"codec": "libvpx-vp9", "preset": None, "crf": 32, "threads": 0, "style": "Fontsize=24"}
+}
+burn_profile = "default"
+smart_render = False  # Re-encode only the GOPs with subtitles on screen, stream copy the rest
+manifest = None  # Ingest manifest of incremental runs, None means copy and process every source object
+remote_input = "NONE"
+chunk_max_time = 0  # Max seconds of audio chunk for parallel recognition, 0 means recognize the whole audio
+chunk_parallel = 8  # Concurrent Speech requests of chunks per video
+bucket_cache_ttl = 600  # Seconds to trust cached bucket existence and location
+bucket_cache = {}  # Bucket name: (expire time, location), location is None if not fetched
+bucket_cache_lock = threading.Lock()
+online_translate_chars = 20000  # Transcripts up to these characters are translated online instead of batch
+live_input = "NONE"
+live_realtime = False
+live_translate = True
+max_inflight = 0  # Videos in progress including those waiting on Speech/Translate, 0 means same as parallel_threads
+translate_batch_window = 0  # Seconds to collect transcripts of many videos into one batch translate, 0 means disable
+translate_batch_size = 100  # Max transcripts per batch translate operation, the API limit is 100 input files
+translate_batcher = None
+output_formats = ["srt"]  # Subtitle formats written to gs://output, of cues.sub_formats
+sub_mode = "hard"  # hard: burn subtitles into video, soft: mux subtitle tracks without re-encoding
+# Subtitle codec of soft subtitle tracks by container, other containers are always hard-encoded
+soft_sub_codecs = {
+    ".mp4": "mov_text",
+    ".mov": "mov_text",
+    ".mkv": "srt",
+    ".webm": "webvtt"
+}
+# ISO 639-2 codes of the language metadata of soft subtitle tracks, by the language part of the Translate code
+iso639_2 = {
+    "af": "afr", "am": "amh", "ar": "ara", "az": "aze", "be": "bel", "bg": "bul", "bn": "ben", "bs": "bos",
+    "ca": "cat", "cs": "ces", "cy": "cym", "da": "dan", "de": "deu", "el": "ell", "en": "eng", "eo": "epo",
+    "es": "spa", "et": "est", "eu": "eus", "fa": "fas", "fi": "fin", "fil": "fil", "fr": "fra", "ga": "gle",
+    "gl": "glg", "gu": "guj", "he": "heb", "iw": "heb", "hi": "hin", "hr": "hrv", "hu": "hun", "hy": "hye",
+    "id": "ind", "is": "isl", "it": "ita", "ja": "jpn", "jv": "jav", "ka": "kat", "kk": "kaz", "km": "khm",
+    "kn": "kan", "ko": "kor", "lo": "lao", "lt": "lit", "lv": "lav", "mk": "mkd", "ml": "mal", "mn": "mon",
+    "mr": "mar", "ms": "msa", "my": "mya", "ne": "nep", "nl": "nld", "no": "nor", "pa": "pan", "pl": "pol",
+    "pt": "por", "ro": "ron", "ru": "rus", "si": "sin", "sk": "slk", "sl": "slv", "sq": "sqi", "sr": "srp",
+    "sv": "swe", "sw": "swa", "ta": "tam", "te": "tel", "th": "tha", "tl": "tgl", "tr": "tur", "uk": "ukr",
+    "ur": "urd", "uz": "uzb", "vi": "vie", "zh": "zho", "zu": "zul"
+}
+burn_segments = 0  # Segments of hard burn-in encoded by parallel ffmpeg, 0 or 1 means one ffmpeg for the whole video
+burn_workers = 0  # Parallel ffmpeg of segment burn-in per video, 0 means the cores divided by parallel_threads
+scratch_dir = "scratch"  # Root of the scratch directories, each video works in its own directory
+budget = None  # Disk and memory budget of admission, None means a video starts as soon as a thread is free
+job_memory = 512 * 1024 * 1024  # Estimated memory of one video, ffmpeg and the results in memory
+encoder_memory = 256 * 1024 * 1024  # Estimated memory of each ffmpeg of segment burn-in
+global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_codes, merge_sub_to_video, two_step_convert, parallel_threads, local_file
+
+def audio_to_file(filename, filename_audio, profile=audio_profiles["source"], source_key=None):
     try:
-        if not os.path.exists(filename_audio):
+        if artifact_cache.enabled() and source_key and filename != filename_audio:
+            # Cached by the source content and extraction parameters
+            key = artifact_cache.make_key(source_key, profile["options"], profile["format"])
+            cached = artifact_cache.get(key, profile["ext"])
+            if cached:
+                print("Audio from cache:", filename_audio)
+                artifact_cache.link(cached, filename_audio)
+            else:
+                def extract(tmp):
+                    ff = FFmpeg(inputs={filename: None},
+                                outputs={tmp: f"-vn {profile['options']} -f {profile['format']} -y -loglevel warning"}
+                                )
+                    print(ff.cmd)
+                    ff.run()
+                artifact_cache.put(key, profile["ext"], extract, filename_audio)
+        elif not os.path.exists(filename_audio):
             ff = FFmpeg(inputs={filename: None},
-                        outputs={filename_audio: '-vn -y -loglevel warning'}
+                        outputs={filename_audio: f"-vn {profile['options']} -y -loglevel warning"}
                         )
             print(ff.cmd)
             ff.run()
@@ -31,14 +142,28 @@ def audio_to_file(filename, filename_audio):
         print(f"ERROR while audio_to_file {filename}: ", e)
 
 
-def get_audio_info(filename_audio):
+def audio_to_bucket(filename, bucket, bucketfile, profile=audio_profiles["source"], input_options=None):
+    # Extract audio track and stream it to GCS without a local audio file
+    ff = FFmpeg(inputs={filename: input_options},
+                outputs={'pipe:1': f"-vn {profile['options']} -f {profile['format']} -loglevel warning"}
+                )
+    return stream_to_bucket(ff, bucket, bucketfile, content_type=f"audio/{profile['format']}")
+
+
+def get_audio_info(filename_audio, cache_key=None):
     try:
-        fr = FFprobe(global_options='-of json -show_streams -select_streams a',
-                     inputs={filename_audio: None}
-                     )
-        print(fr.cmd)
-        res = fr.run(stdout=PIPE, stderr=PIPE)
-        stream_detail = json.loads(res[0]).get('streams')[0]
+        stream_detail = None
+        if artifact_cache.enabled() and cache_key:
+            stream_detail = artifact_cache.get_json(artifact_cache.make_key(cache_key, "probe"))
+        if stream_detail is None:
+            fr = FFprobe(global_options='-of json -show_streams -select_streams a',
+                         inputs={filename_audio: None}
+                         )
+            print(fr.cmd)
+            res = fr.run(stdout=PIPE, stderr=PIPE)
+            stream_detail = json.loads(res[0]).get('streams')[0]
+            if artifact_cache.enabled() and cache_key:
+                artifact_cache.put_json(artifact_cache.make_key(cache_key, "probe"), stream_detail)
         sample_rate = int(stream_detail['sample_rate'])
         channels = int(stream_detail['channels'])
         print(filename_audio, 'sample_rate:', sample_rate, 'channels: ', channels)
@@ -47,160 +172,651 @@ def get_audio_info(filename_audio):
     return sample_rate, channels
 
 
+def audio_speech2txt(source, out_file, profile, source_key=None, work="."):
+    # Extract the whole audio track to gs://tmp and recognize it in one Speech operation
+    # work: scratch directory of the local audio file
+    # The profile is in the name, so an audio file left by a run with another profile is never reused
+    filename_audio = f"{out_file}.{audio_profile}{profile['ext']}"
+    local_audio = os.path.join(work, filename_audio)
+    start_time = datetime.datetime.now()
+    if stream_upload:
+        # Stream audio track to gs://tmp while extracting
+        audio_size = audio_to_bucket(source, bucket_tmp, f"{out_file}/{filename_audio}", profile)
+        audio_file_info = source
+    else:
+        # Get audio track to file
+        audio_to_file(source, local_audio, profile, source_key)
+        audio_size = os.path.getsize(local_audio)
+        audio_file_info = local_audio
+
+        # Upload audio to gs://tmp
+        upload(bucket=bucket_tmp,
+            localfile=local_audio,
+            bucketfile=f"{out_file}/{filename_audio}")
+    spent_time = str(datetime.datetime.now() - start_time)
+    print(f"Audio profile {audio_profile}: {filename_audio} {audio_size / 1048576:.2f} MB, extracted and uploaded with Time {spent_time}")
+
+    # Get audio detail info, the profile fixes what ffmpeg produced, otherwise it keeps the source
+    if profile["sample_rate"] and profile["channels"]:
+        sample_rate, channels = profile["sample_rate"], profile["channels"]
+    else:
+        info_key = source_key
+        if source_key and audio_file_info != source:
+            info_key = artifact_cache.make_key(source_key, profile["options"], profile["format"])
+        sample_rate, channels = get_audio_info(audio_file_info, info_key)
+
+    # Speech to text
+    storage_uri = f"gs://{bucket_tmp}/{out_file}/{filename_audio}"
+    return speech2txt(
+        sample_rate=sample_rate,
+        channels=channels,
+        encoding=profile["encoding"],
+        language_code=video_src_language_code,
+        storage_uri=storage_uri
+    )
+
+
+def chunk_speech2txt(source, out_file, profile, sample_rate, channels):
+    """
+    Split audio at silence gaps into chunks of at most chunk_max_time seconds,
+    extract and recognize chunks in parallel, and stitch words back to the timeline of the video.
+    Each chunk is a short Speech operation, so latency is about the longest chunk rather than the whole audio.
+    Return the list of cues
+    """
+    start_time = datetime.datetime.now()
+    try:
+        chunks = split_chunks(get_duration(source), detect_silence(source), chunk_max_time)
+        print(f"Split audio into {len(chunks)} chunks: {source}")
+
+        def recognize_chunk(i):
+            start, end = chunks[i]
+            bucketfile = f"{out_file}/{out_file}.chunk{i:04d}{profile['ext']}"
+            audio_to_bucket(source, bucket_tmp, bucketfile, profile,
+                            input_options=f"-ss {start:.3f} -t {end - start:.3f}")
+            return recognize_results(sample_rate, channels, video_src_language_code,
+                                     f"gs://{bucket_tmp}/{bucketfile}", profile["encoding"], offset=start)
+
+        with futures.ThreadPoolExecutor(max_workers=chunk_parallel) as pool:
+            # Mostly waiting on Speech operations of the chunks, the cpu slot of this video is free meanwhile
+            with lro_engine.released_slot():
+                chunk_results = list(pool.map(recognize_chunk, range(len(chunks))))
+    except Exception as e:
+        print(f"ERROR while chunk_speech2txt {source}: ", e)
+        return "ERR"
+    if "ERR" in chunk_results:
+        return "ERR"
+    spent_time = str(datetime.datetime.now() - start_time)
+    print(f"Transcribed {len(chunks)} chunks with Time {spent_time}, {source}")
+    return stitch_results(chunk_results)
+
+
 def upload(bucket, localfile, bucketfile):
+    # Large files are uploaded in parallel parts and composed
     bucket = storage_client.bucket(bucket)
-    blob = bucket.blob(bucketfile)
-    blob.upload_from_filename(localfile)
+    transfer.upload(bucket, localfile, bucketfile)
+
+
+def upload_text(bucketfile, text):
+    # Save JSON text as an object in gs://tmp, return its uri
+    storage_client.bucket(bucket_tmp).blob(bucketfile).upload_from_string(text, content_type="application/json")
+    return f"gs://{bucket_tmp}/{bucketfile}"
+
+
+def download_text(uri):
+    # Text of gs://bucket/object
+    bucket, bucketfile = uri[len("gs://"):].split("/", 1)
+    return storage_client.bucket(bucket).blob(bucketfile).download_as_text()
+
+
+def upload_cues(bucket, bucketfile, subs):
+    # Write srt of the cues into GCS one cue at a time, without a local file
+    blob = storage_client.bucket(bucket).blob(bucketfile)
+    with blob.open("w", encoding="utf8", content_type="text/plain") as f:
+        subs.write_srt(f)
+
+
+def stream_to_bucket(ff, bucket, bucketfile, content_type=None):
+    """
+    Run ffmpeg with output to pipe:1 and upload its stdout to GCS while encoding,
+    through a resumable upload in chunks of stream_chunk_size.
+    Local disk is not used and memory is bounded by the chunk size.
+    The object is only finalized if ffmpeg exits successfully. Return the uploaded size in bytes.
+    """
+    blob = storage_client.bucket(bucket).blob(bucketfile)
+    r, w = os.pipe()
+    print(ff.cmd)
+    with futures.ThreadPoolExecutor(max_workers=1) as ff_thread:
+        ff_run = ff_thread.submit(ff.run, stdout=w)
+        ff_run.add_done_callback(lambda _: os.close(w))  # EOF for the reader once ffmpeg exits
+        with os.fdopen(r, 'rb') as reader:
+            writer = blob.open("wb", chunk_size=stream_chunk_size, content_type=content_type)
+            size = 0
+            while True:
+                chunk = reader.read(stream_chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                size += len(chunk)
+            ff_run.result()  # Raise if ffmpeg failed, leaving the resumable session unfinished
+            writer.close()
+    print(f"Streamed to gs://{bucket}/{bucketfile}")
+    return size
 
 
 def download(bucket, localfile, bucketfile):
     bucket = storage_client.bucket(bucket)
-    blob = bucket.blob(bucketfile)
-    blob.download_to_filename(localfile)
+    if artifact_cache.enabled():
+        # Cached by object checksum, download only if the content is not in the cache
+        blob = bucket.get_blob(bucketfile)
+        key = artifact_cache.blob_key(blob)
+        suffix = os.path.splitext(bucketfile)[1]
+        cached = artifact_cache.get(key, suffix)
+        if cached:
+            print("Download from cache:", bucketfile)
+            artifact_cache.link(cached, localfile)
+        else:
+            artifact_cache.put(key, suffix, lambda tmp: transfer.download(blob, tmp), localfile)
+        return
+    # Large objects are downloaded as concurrent byte-range slices
+    blob = bucket.get_blob(bucketfile)
+    transfer.download(blob, localfile)
     # TODO: Now not support sub folder
 
 
+def source_cache_key(filename):
+    # Cache key of the source video by content of gs://in object, or by local file stat
+    if local_file == "NONE":
+        return artifact_cache.blob_key(storage_client.bucket(bucket_in).get_blob(filename))
+    return artifact_cache.file_key(filename)
+
+
 def process_video(filename):
+    # Each video works in its own scratch directory, which is removed at once when it ends, whatever the result
+    # Two step and local file runs work in the current directory, the second step uses files of the first
+    if local_file != "NONE" or two_step_convert.lower() != "false":
+        return run_video(filename, ".")
+    work = admission.make_scratch(scratch_dir, os.path.splitext(filename)[0])
+    try:
+        return run_video(filename, work)
+    finally:
+        admission.remove_scratch(work)
+
+
+def run_video(filename, work):
     print("! Start processing...", filename)
     out_file = os.path.splitext(filename)[0]  # Pre-fix of the file
+    local_source = os.path.join(work, filename)
+    source = local_source  # Video input of ffmpeg/ffprobe, local file or ranged-read url
+
+    # Read video from gs://in through ranged HTTP reads, without local copy
+    if local_file == "NONE" and remote_input.upper() != "NONE":
+        source = remote_url(storage_client, bucket_in, filename, remote_input)
+        print("Remote input video from:", bucket_in, filename)
+
+    lang_cues = {}  # Translated cues of each language for burn-in, empty in the second step
+    merge = merge_sub_to_video and two_step_convert.lower() != "first"
+
+    # Completed stages of a previous run of this video, to resume at the first incomplete stage
+    track = job_state.enabled() and two_step_convert.lower() == "false"
+    source_key = source_cache_key(filename) if artifact_cache.enabled() or track else None
+    done = job_state.load(filename, source_key) if track else {}
+    if done:
+        print(f"Resume {filename} after stages: {', '.join(done)}")
 
     # Download video from gs://in
     if two_step_convert.lower() != "second":
-        if local_file == "NONE":
+        if local_file == "NONE" and source == local_source and ("recognized" not in done or merge):
             print("Download video from:", bucket_in, filename)
-            download(bucket_in, filename, filename)
-
-        # Get audio track to file
-        filename_audio = out_file + ".flac"
-        audio_to_file(filename, filename_audio)
+            download(bucket_in, local_source, filename)
+
+        profile = audio_profiles[audio_profile]
+        if "recognized" in done:
+            # Cues of the Speech result of the previous run
+            subs = cues.CueList.from_dict(json.loads(download_text(done["recognized"]["cues"])))
+        elif chunk_max_time > 0:
+            # Speech to text by audio chunks split at silence gaps, in parallel
+            if profile["sample_rate"] and profile["channels"]:
+                sample_rate, channels = profile["sample_rate"], profile["channels"]
+            else:
+                sample_rate, channels = get_audio_info(source, source_key)
+            subs = chunk_speech2txt(source, out_file, profile, sample_rate, channels)
+        else:
+            # Speech to text of the whole audio track
+            subs = audio_speech2txt(source, out_file, profile, source_key, work)
+        if subs == "ERR":
+            return "ERR"
 
-        # Get audio detail info
-        sample_rate, channels = get_audio_info(filename_audio)
+        if "recognized" not in done:
+            # Cues stay in memory, the original srt goes to gs://tmp without a local file
+            upload_cues(bucket_tmp, f"{out_file}/{out_file}.{video_src_language_code}.srt", subs)
+            if track:
+                job_state.checkpoint(filename, source_key, "recognized", {
+                    "cues": upload_text(f"{out_file}/{out_file}.cues.json", json.dumps(subs.to_dict()))})
+
+        # Translate lines of the video into lines of each target language
+        if "translated" in done and all(lang in done["translated"]["langs"] for lang in translate_des_codes):
+            translated = json.loads(download_text(done["translated"]["lines"]))
+        else:
+            translated = translate_video(out_file, [t.strip() for t in subs.texts])
+            if translated == "ERR":
+                return "ERR"
+            if track:
+                job_state.checkpoint(filename, source_key, "translated", {
+                    "langs": translate_des_codes,
+                    "lines": upload_text(f"{out_file}/{out_file}.translated.json", json.dumps(translated))})
+
+        out_subs = []
+        for lang in translate_des_codes:
+            lang_cues[lang] = subs.with_texts(translated[lang])
+            # compose translated lines into every output format
+            out_subs += txt2srt(
+                subs=subs,
+                lines=translated[lang],
+                lang=lang,
+                out_file=os.path.join(work, out_file),
+                formats=output_formats
+            )
+
+        # upload subtitles to gs://output in parallel, the local files are still written for burn-in
+        if "subtitled" not in done:
+            with futures.ThreadPoolExecutor(max_workers=len(out_subs)) as pool:
+                list(pool.map(lambda f: upload(bucket_out, f, os.path.basename(f)), out_subs))
+            if track:
+                job_state.checkpoint(filename, source_key, "subtitled",
+                                     {"files": [f"gs://{bucket_out}/{os.path.basename(f)}" for f in out_subs]})
+
+    if merge:
+        if job_sub_mode(filename) == "soft" and os.path.splitext(filename)[1] in soft_sub_codecs:
+            merge_re = [mux_video(source, filename, out_file, work)]
+        else:
+            merge_re = [merge_video(source, filename, out_file, lang, lang_cues.get(lang), work)
+                        for lang in translate_des_codes]
+        if "ERR" in merge_re:
+            return "ERR"
 
-        # Upload audio to gs://tmp
-        upload(bucket=bucket_tmp,
-            localfile=filename_audio,
-            bucketfile=f"{out_file}/{filename_audio}")
+    if track:
+        # All stages done, a later run of this video starts from the beginning
+        job_state.clear(filename)
 
-        # Speech to text
-        storage_uri = f"gs://{bucket_tmp}/{out_file}/{filename_audio}"
-        s2t_re = speech2txt(
-            sample_rate=sample_rate,
-            channels=channels,
-            language_code=video_src_language_code,
-            storage_uri=storage_uri,
-            out_file=out_file
-        )
-        if s2t_re == "ERR":
-            return "ERR"
+    # Delete all local temp files of the second step, others are removed with the scratch directory
+    if two_step_convert.lower() == "second" and local_file == "NONE":
+        clean_local(out_file)
+    return
 
-        # Upload txt file to bucket_tmp
-        input_uri = f"gs://{bucket_tmp}/{out_file}/{out_file}.{video_src_language_code}.txt"
-        upload(bucket=bucket_tmp,
-            localfile=f"{out_file}.{video_src_language_code}.txt",
-            bucketfile=f"{out_file}/{out_file}.{video_src_language_code}.txt")
-        upload(bucket=bucket_tmp,
-            localfile=f"{out_file}.{video_src_language_code}.srt",
-            bucketfile=f"{out_file}/{out_file}.{video_src_language_code}.srt")
 
+def translate_video(out_file, lines):
+    """
+    Translate lines of the video, return dict of language: translated lines in the same order.
+    With translation memory, only lines not translated before are sent, each unique line once.
+    Short transcripts are translated online, long ones by batch translate.
+    With a translate batcher, every transcript goes to the shared batch, since small videos are what it batches.
+    """
+    todo = lines
+    if translation_memory.enabled():
+        known = {lang: translation_memory.lookup(lines, translate_src_code, lang) for lang in translate_des_codes}
+        todo = list(dict.fromkeys(translation_memory.normalize(line) for line in lines
+                                  if any(translation_memory.normalize(line) not in known[lang] for lang in translate_des_codes)))
+        print(f"Translation memory: {len(todo)} of {len(lines)} lines to translate: {out_file}")
+
+    characters = sum(len(line) for line in todo)
+    if not todo:
+        translated = {lang: [] for lang in translate_des_codes}
+    elif translate_batcher is None and characters <= online_translate_chars:
+        # Short transcript, translate online in memory
+        translated = online_translate(todo, out_file, characters)
+    else:
+        translated = batch_translate(todo, out_file)
+    if translated == "ERR":
+        return "ERR"
+
+    result = {}
+    for lang in translate_des_codes:
+        lang_lines = translated[lang]
+        if translation_memory.enabled():
+            new = dict(zip(todo, lang_lines))
+            translation_memory.store(new, translate_src_code, lang)
+            known[lang].update(new)
+            lang_lines = [known[lang][translation_memory.normalize(line)] for line in lines]
+        result[lang] = [line.replace("\n", " ") for line in lang_lines]
+    return result
+
+
+def batch_translate(lines, out_file):
+    # Translate lines with batch translate operation through gs://tmp, for long transcripts
+    # Return dict of language: translated lines
+    # Upload txt to bucket_tmp from memory
+    input_uri = f"gs://{bucket_tmp}/{out_file}/{out_file}.{video_src_language_code}.txt"
+    storage_client.bucket(bucket_tmp).blob(f"{out_file}/{out_file}.{video_src_language_code}.txt").upload_from_string(
+        "".join(line + "\n" for line in lines), content_type="text/plain")
+
+    if translate_batcher is not None:
+        # Share one translate operation with transcripts of other videos
+        output_folder = translate_batcher.translate(input_uri)
+        if output_folder == "ERR":
+            return "ERR"
+    else:
         # Submit translate
-        output_uri_prefix = f"gs://{bucket_tmp}/{out_file}-translated/"
+        output_folder = f"{out_file}-translated/"
+        output_uri_prefix = f"gs://{bucket_tmp}/{output_folder}"
 
-        clean_bucket(bucket_tmp, out_file + "-translated/")  # If output not empty, then clean them
+        clean_bucket(bucket_tmp, output_folder)  # If output not empty, then clean them
 
+        # One translate operation for all target languages
         translate_re = batch_translate_text(
-            input_uri, output_uri_prefix, project_id, translate_location, translate_src_code, translate_des_code
+            input_uri, output_uri_prefix, project_id, translate_location, translate_src_code, translate_des_codes
         )
         if translate_re == "ERR":
             return "ERR"
 
-        # get translate txt and compose into srt
-        translated_txt = f"{out_file}-translated/{bucket_tmp}_{out_file}_{out_file}.{video_src_language_code}_{translate_des_code}_translations.txt"
+    translated = {}
+    for lang in translate_des_codes:
+        # get translate txt
+        translated_txt = f"{output_folder}{bucket_tmp}_{out_file}_{out_file}.{video_src_language_code}_{lang}_translations.txt"
         print("get translate txt and compose into srt: ", translated_txt)
-        download(bucket=bucket_tmp,
-                localfile=f"{out_file}.{translate_des_code}.txt",
-                bucketfile=translated_txt)
-
-        txt2srt(
-            orgfile=f"{out_file}.{video_src_language_code}.srt",
-            langfile=f"{out_file}.{translate_des_code}.txt",
-            lang=translate_des_code,
-            out_file=out_file
-        )
+        try:
+            translated[lang] = storage_client.bucket(bucket_tmp).blob(translated_txt).download_as_text().splitlines()
+        except NotFound as e:
+            print(f"ERROR while reading translation {translated_txt}: ", e)
+            return "ERR"
+    return translated
 
-        # upload srt to gs://output
-        out_srt = f"{out_file}.{translate_des_code}.srt"
-        upload(bucket_out, out_srt, out_srt)
 
-    if merge_sub_to_video and two_step_convert.lower() != "first":
-        try:
-            out_video = f"{out_file}.{translate_des_code}{os.path.splitext(filename)[1]}"
+def submit_translate_batch(input_uris, batch_id):
+    # One batch translate operation for the transcripts of many videos
+    # Return the output folder in bucket_tmp, output files are named by their input as in batch_translate
+    output_folder = f"translated-{batch_id}/"
+    translate_re = batch_translate_text(
+        input_uris, f"gs://{bucket_tmp}/{output_folder}", project_id, translate_location, translate_src_code,
+        translate_des_codes
+    )
+    if translate_re == "ERR":
+        return "ERR"
+    return output_folder
+
+
+def online_translate(lines, out_file, characters):
+    # Translate lines with online translate_text requests in memory, no GCS round-trip and no operation to wait
+    # Return dict of language: translated lines
+    start_time = datetime.datetime.now()
+    translated = {}
+    for lang in translate_des_codes:
+        translated[lang] = online_translate_text(lines, project_id, translate_src_code, lang)
+        if translated[lang] == "ERR":
+            return "ERR"
+    spent_time = str(datetime.datetime.now() - start_time)
+    print(f"Translated online Time: {spent_time}", out_file, f"Total Characters: {characters}")
+    return translated
+
+
+def merge_video(source, filename, out_file, lang, lang_subs=None, work="."):
+    # Hard-encode the subtitles of lang into video and upload to gs://output
+    # lang_subs: CueList of lang, None means loading it from the srt
+    # work: scratch directory of the subtitle files and the output video
+    local = os.path.join(work, out_file)
+    out_srt = f"{local}.{lang}.srt"
+    out_ass = f"{local}.{lang}.ass"
+    try:
+        ext = os.path.splitext(filename)[1]
+        out_video = f"{out_file}.{lang}{ext}"
+        local_video = os.path.join(work, out_video)
+        profile = burn_profiles[burn_profile]
+        start_time = time.time()
+        smart = None
+        if smart_render:
+            # Encoder of the source codec, so re-encoded GOPs can be joined with copied ones
+            smart = burn_in.video_stream(source)
+            if smart.get("codec_name") in burn_in.smart_encoders:
+                codec = burn_in.smart_encoders[smart["codec_name"]]
+                if codec != profile["codec"]:
+                    # CRF and preset of the profile are on the scale of another encoder
+                    profile = dict(profile, codec=codec, crf=burn_in.smart_crf[codec],
+                                   preset=profile["preset"] if codec != "libvpx-vp9" else None)
+            else:
+                print(f"Smart render not supported for codec {smart.get('codec_name')}, burn the whole video")
+                smart = None
+        if burn_segments > 1 or smart:
+            # Burn segments split at keyframes by parallel ffmpeg, then join them without re-encoding
+            # Videos in parallel share the cores, so ffmpeg of all of them don't oversubscribe the CPU
+            if lang_subs is None:
+                # In second step, the srt may be edited after the first step
+                lang_subs = cues.CueList.from_subtitles(load_srt(out_srt))
+            encoders = burn_workers or max(1, os.cpu_count() // parallel_threads)
+            threads = profile["threads"] or burn_in.encoder_threads(parallel_threads, encoders)
+            options = burn_in.encode_options(profile, threads)
+            if smart and smart.get("pix_fmt"):
+                options += f" -pix_fmt {smart['pix_fmt']}"
+            list_file, duration = burn_in.burn_segments(source, lang_subs, local, lang, ext, burn_segments,
+                                                        encoders, options, profile["style"], smart)
+            inputs = {list_file: "-f concat -safe 0", source: None}
+            sub_options = "-map 0:v -map 1:a? -c copy"
+        else:
+            if "ass" in output_formats and two_step_convert.lower() != "second" and os.path.exists(out_ass):
+                # Styled ASS written from the cues, no srt conversion in ffmpeg
+                sub_file = out_ass
+            else:
+                # In second step, the srt may be edited after the first step
+                sub_file = out_srt
+            encoders = 1
+            threads = profile["threads"] or burn_in.encoder_threads(parallel_threads)
+            duration = get_duration(source)
+            inputs = {source: None}
+            sub_options = (f"{burn_in.subtitle_filter(sub_file, profile['style'])} "
+                           f"{burn_in.encode_options(profile, threads)} -c:a copy")
+        if stream_upload:
+            # ffmpeg convert video with hard-subtitles and stream it to gs://output
+            ff = FFmpeg(inputs=inputs,
+                        outputs={'pipe:1': f"{sub_options} {stream_formats[ext]}"}
+                        )
+            stream_to_bucket(ff, bucket_out, out_video)
+        else:
             # ffmpeg convert video to video with hard-subtitles
-            ff = FFmpeg(inputs={filename: None},
-                        outputs={out_video: f"-y -vf 'subtitles={out_file}.{translate_des_code}.srt':force_style='Fontsize=24'"}
+            ff = FFmpeg(inputs=inputs,
+                        outputs={local_video: f"-y {sub_options}"}
                         )
             print(ff.cmd)
             ff.run()
 
             # Upload video to gs://output
-            upload(bucket_out, out_video, out_video)
-            print(f"Uploaded video with sub to {out_video}")
-        except Exception as e:
-            print(f"ERROR while merge_sub_to_video {out_srt}: ", e)
+            upload(bucket_out, local_video, out_video)
+        burn_in.record(burn_profile, duration, time.time() - start_time, min(os.cpu_count(), encoders * threads))
+        print(f"Uploaded video with sub to {out_video}")
+    except Exception as e:
+        print(f"ERROR while merge_sub_to_video {out_srt}: ", e)
+        return "ERR"
 
-    # Delete all local temp files
-    if two_step_convert.lower() != "first" and local_file == "NONE":
-        clean_local(out_file)
-    return
+
+def job_sub_mode(filename):
+    # Custom metadata sub_mode (hard or soft) of the video in gs://in overrides sub_mode for this video
+    if local_file != "NONE":
+        return sub_mode
+    try:
+        blob = storage_client.bucket(bucket_in).get_blob(filename)
+        metadata = blob.metadata if blob and blob.metadata else {}
+    except Exception as e:
+        print(f"ERROR while getting metadata of {filename}: ", e)
+        return sub_mode
+    return metadata.get("sub_mode", sub_mode).lower()
+
+
+def track_language(lang):
+    # ISO 639-2 code of a Translate language code, e.g. zh-TW is zho, und if unknown
+    return iso639_2.get(lang.split("-")[0].lower(), "und")
+
+
+def mux_video(source, filename, out_file, work="."):
+    """
+    Mux the subtitles of every language as soft subtitle tracks into one video and upload to gs://output.
+    Video and audio streams are copied, so it takes about the time of copying the file.
+    work: scratch directory of the subtitle files and the output video
+    """
+    ext = os.path.splitext(filename)[1]
+    out_video = f"{out_file}.subs{ext}"
+    local = os.path.join(work, out_file)
+    local_video = os.path.join(work, out_video)
+    try:
+        inputs = {source: None}
+        options = "-map 0:v? -map 0:a?"
+        metadata = ""
+        for i, lang in enumerate(translate_des_codes):
+            # Track from srt, or another text format if srt is not in the outputs
+            sub_file = next((f"{local}.{lang}.{fmt}" for fmt in ["srt", "vtt", "ass"]
+                             if os.path.exists(f"{local}.{lang}.{fmt}")), f"{local}.{lang}.srt")
+            inputs[sub_file] = None
+            options += f" -map {i + 1}:0"
+            metadata += f" -metadata:s:s:{i} language={track_language(lang)} -metadata:s:s:{i} title={lang}"
+        options += f" -c copy -c:s {soft_sub_codecs[ext]}{metadata}"
+        if stream_upload:
+            # Stream the muxed video to gs://output
+            ff = FFmpeg(inputs=inputs, outputs={'pipe:1': f"{options} {stream_formats[ext]}"})
+            stream_to_bucket(ff, bucket_out, out_video)
+        else:
+            ff = FFmpeg(inputs=inputs, outputs={local_video: f"-y {options}"})
+            print(ff.cmd)
+            ff.run()
+
+            # Upload video to gs://output
+            upload(bucket_out, local_video, out_video)
+        print(f"Uploaded video with soft subtitles of {','.join(translate_des_codes)} to {out_video}")
+    except Exception as e:
+        print(f"ERROR while mux subtitles into {out_video}: ", e)
+        return "ERR"
+
+
+def live_video(source):
+    # Subtitles of a live event or file with streaming recognition, cues are appended to local srt/vtt as they arrive
+    rstr = r"[\/\\\:\*\?\"\<\>\|\[\]\'\ \@\’\,]"  # '/ \ : * ? " < > | [ ] ' @ '
+    out_file = re.sub(rstr, "_", os.path.splitext(os.path.basename(source.rstrip("/")))[0])
+    print("! Start live subtitles...", source)
+    files = live_recognize(
+        source=source,
+        language_code=video_src_language_code,
+        out_file=out_file,
+        project_id=project_id,
+        translate_src_code=translate_src_code,
+        translate_des_codes=translate_des_codes if live_translate else [],
+        realtime=live_realtime
+    )
+
+    # Upload subtitles to gs://output after the event
+    for f in files:
+        upload(bucket_out, f, f)
+    print(f"! Finished live subtitles output to gs://{bucket_out}")
+
+
+def job_footprint(size):
+    """
+    Estimated (disk, memory) in bytes of a video of size bytes in its scratch directory:
+    the downloaded source, the audio track, and the output videos and burn-in segments of every language,
+    each about the size of the source. Remote input and stream upload take no disk for what they stream.
+    """
+    merge = merge_sub_to_video and two_step_convert.lower() != "first"
+    segmented = merge and sub_mode == "hard" and (burn_segments > 1 or smart_render)
+    disk = 0
+    if remote_input.upper() == "NONE":
+        disk += size
+    if not stream_upload:
+        disk += size * 0.1  # Audio track, a few percent of the video with flac16k
+        if merge:
+            disk += size * (1 if sub_mode == "soft" else len(translate_des_codes))
+    memory = job_memory
+    if segmented:
+        disk += size * len(translate_des_codes)
+        memory += (burn_workers or max(1, os.cpu_count() // parallel_threads)) * encoder_memory
+    if stream_upload:
+        memory += 2 * stream_chunk_size
+    return disk, memory
+
+
+def output_config():
+    # Hash of the settings that change the outputs of a video, a manifest entry produced with another is redone
+    config = {"source": video_src_language_code, "langs": translate_des_codes, "formats": output_formats,
+              "merge": merge_sub_to_video, "sub_mode": sub_mode}
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf8")).hexdigest()
+
+
+def process_video_slot(filename, size=0):
+    # Admitted when its estimated disk and memory fit what the running videos leave of the budget,
+    # then processed in a cpu slot, the slot is given to other videos while waiting on Speech/Translate
+    with budget.admit(filename, *job_footprint(size)) if budget else nullcontext():
+        with lro_engine.job_slot():
+            process_re = process_video(filename)
+    if manifest is not None and process_re != "ERR":
+        manifest.produced(filename)
+    return process_re
+
+
+def cached_bucket(bucket):
+    # Return (exists, location) from the bucket cache, location is None if not fetched
+    with bucket_cache_lock:
+        cached = bucket_cache.get(bucket)
+    if cached and cached[0] > time.time():
+        return True, cached[1]
+    return False, None
+
+
+def cache_bucket(bucket, location=None):
+    with bucket_cache_lock:
+        bucket_cache[bucket] = (time.time() + bucket_cache_ttl, location)
+
+
+def bucket_location(bucket):
+    exists, location = cached_bucket(bucket)
+    if location is None:
+        location = storage_client.get_bucket(bucket).location
+        cache_bucket(bucket, location)
+    return location
 
 
 def create_bucket(buckets, bucket_org):
     # Create bucket in the same location as bucket
-    r = storage_client.get_bucket(bucket_org)
-    location = r.location
-
-    for b in buckets:
+    # Existence and location are cached for bucket_cache_ttl, so repeated calls cost no request
+    # Buckets not cached are checked in one listing of the buckets named like bucket_org
+    missing = [b for b in buckets if not cached_bucket(b)[0]]
+    if not missing:
+        return
+    existing = bulk.existing_buckets(storage_client, bucket_org)
+    for name, location in (existing or {}).items():
+        cache_bucket(name, location)
+    for b in missing:
+        if cached_bucket(b)[0]:
+            continue
         bb = storage_client.bucket(b)
-        if not bb.exists():
-            storage_client.create_bucket(bb, location=location)
+        if existing is not None or not bb.exists():
+            try:
+                storage_client.create_bucket(bb, location=bucket_location(bucket_org))
+            except Conflict:
+                pass  # Exists in another project, not in the listing
+        cache_bucket(b)
 
 
 def clean_bucket(bucket, prefix):
-    file_list = storage_client.list_blobs(bucket, prefix=prefix)
-    b = storage_client.bucket(bucket)
-    for file in file_list:
-        print(f"Output folder not empty, clean... gs://{bucket}/{file.name}")
-        b.blob(file.name).delete()
+    names = [f.name for f in bulk.list_blobs(storage_client, bucket, prefix)]
+    if names:
+        print(f"Output folder not empty, clean {len(names)} objects... gs://{bucket}/{prefix}")
+        bulk.delete(storage_client, bucket, names)
 
 
 def clean_local(out_file):
+    # Files of out_file in the working directory, not those of another video whose name starts with it
     f_list = os.listdir(os.getcwd())
     for f in f_list:
-        if f.startswith(out_file):
+        if f.startswith(out_file + ".") and os.path.isfile(f):
             os.remove(f)
 
 
-def make_list(file_inter):
-    m_list = []
-    for f in file_inter:
-        m_list.append(f.name)
-    return m_list
-
-
-def compare_bucket(bucket_in, bucket_out, lang):
+def compare_bucket(bucket_in, bucket_out, langs):
     print(f"Comparing input and output bucket")
-    source_inter = storage_client.list_blobs(bucket_in)
-    target_inter = storage_client.list_blobs(bucket_out)
-
-    src_bucket = make_list(source_inter)
-    des_bucket = make_list(target_inter)
-
+    # Outputs were uploaded during the run, so gs://output is listed again
+    src_bucket = [f.name for f in bulk.list_blobs(storage_client, bucket_in)]
+    des_bucket = {f.name for f in bulk.list_blobs(storage_client, bucket_out, refresh=True)}
     delta_list = []
     for s in src_bucket:
         prefix = os.path.splitext(s)[0]
-        full = prefix + "." + lang + ".srt"
-        if full not in des_bucket:
-            delta_list.append(s)
+        for lang in langs:
+            full = prefix + "." + lang + "." + output_formats[0]
+            if full not in des_bucket:
+                delta_list.append(s)
+                break
     if len(delta_list) != 0:
         print("There files are not finished output. Please check:", delta_list)
     else:
@@ -209,28 +825,43 @@ def compare_bucket(bucket_in, bucket_out, lang):
 
 
 def bucket_file_name(bucket_org):
-    list = storage_client.list_blobs(bucket_org)
-    file_list = []
+    # Return list of (filename, size) from the listing, the size is used for admission
+    # With manifest, objects unchanged since the last run are not copied again, and skipped if produced
+    # The listing is shared with the GUI, and objects are copied in parallel, videos failed to copy are skipped
+    blobs = bulk.list_blobs(storage_client, bucket_org)
+    entries = []
+    copies = []
+    skipped = 0
     rstr = r"[\/\\\:\*\?\"\<\>\|\[\]\'\ \@\’\,]"  # '/ \ : * ? " < > | [ ] ' @ '
-    for f in list:
+    for f in blobs:
+        if manifest is not None and manifest.is_produced(f):
+            skipped += 1
+            continue
         filename = f.name
         # Change filename if match special character
-        filename_old = filename
         if re.search(rstr, filename):
             filename = re.sub(rstr, "_", filename)
-        source_bucket = storage_client.bucket(bucket_org)
-        source_blob = source_bucket.blob(filename_old)
-        destination_bucket = storage_client.bucket(bucket_in)
-        source_bucket.copy_blob(
-            source_blob, destination_bucket, filename
-        )
+        copy = manifest is None or not manifest.is_copied(f)
+        if copy:
+            copies.append((f.name, filename))
+        entries.append((f, filename, copy))
+    failed = bulk.copy(storage_client, bucket_org, bucket_in, copies) if copies else set()
 
-        file_list.append(filename)
+    file_list = []
+    for f, filename, copy in entries:
+        if f.name in failed:
+            continue
+        if copy and manifest is not None:
+            manifest.copied(f, filename)
+        file_list.append((filename, f.size or 0))
+    if manifest is not None:
+        manifest.save()
+        print(f"Ingest manifest: {len(file_list)} new or changed videos, {skipped} unchanged and produced, skip")
     return file_list
 
 
 def main():
-    global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_code, translate_location, merge_sub_to_video, two_step_convert, parallel_threads, local_file
+    global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_codes, translate_location, merge_sub_to_video, two_step_convert, parallel_threads, local_file, stream_upload, audio_profile, remote_input, chunk_max_time, max_inflight, live_input, live_realtime, live_translate, online_translate_chars, translate_batcher, output_formats, sub_mode, burn_segments, burn_workers, burn_profile, smart_render, manifest, scratch_dir, budget
     parser = argparse.ArgumentParser()
     parser.add_argument("--bucket", type=str, default="hzb-video-en")
 
@@ -239,17 +870,89 @@ def main():
 
     parser.add_argument("--translate_src_language", type=str, default="en")
     parser.add_argument("--translate_des_language", type=str, default="zh")
+    # Up to 10 languages separated by comma, e.g. zh,ja,ko. One translate operation for all of them
     # Translate language code: https://cloud.google.com/translate/docs/languages
 
     parser.add_argument("--translate_location", type=str, default="us-central1")
     # Because we use batch translate, only support us-central1
 
+    parser.add_argument("--translation_memory", type=str, default="NONE")
+    # SQLite file of translation memory, e.g. tm.sqlite. Lines translated before are not sent to translate again
+
+    parser.add_argument("--online_translate_chars", type=int, default=20000)
+    # Transcripts up to these characters are translated with online API in memory, in seconds instead of minutes
+    # Longer transcripts use batch translate, 0 means always batch translate. Not used with --translate_batch_window
+
+    parser.add_argument("--translate_batch_window", type=int, default=0)
+    # Seconds to collect transcripts of many videos and batch translate them in one operation, 0 means disable
+    # Better with --max_inflight, so more videos can wait in the same batch. Short transcripts are batched too
+
+    parser.add_argument("--translate_batch_size", type=int, default=100)
+    # Max transcripts in one batch translate operation, a full batch is submitted without waiting the window
+
+    parser.add_argument("--sub_formats", type=str, default="srt")
+    # Subtitle formats to output, separated by comma, of srt, vtt, ass, ttml, e.g. srt,vtt,ass
+    # With ass, hard-encoding uses the ass file directly
+
     parser.add_argument("--merge_sub_to_video", type=str, default="True")
     # Hard-encode the srt subtitle file into video
 
+    parser.add_argument("--sub_mode", type=str, default="hard", choices=["hard", "soft"])
+    # hard: burn subtitles into the video of each language, re-encoding video and audio
+    # soft: mux subtitles of all languages as tracks into one video with -c copy, only mp4, mov, mkv, webm
+    # Per video, custom metadata sub_mode of the object in the bucket overrides it
+
+    parser.add_argument("--burn_segments", type=int, default=0)
+    # Split hard burn-in at keyframes into segments encoded by parallel ffmpeg, e.g. 32 on a 32-core VM
+    # 0 means one ffmpeg for the whole video
+
+    parser.add_argument("--burn_workers", type=int, default=0)
+    # Parallel ffmpeg of segment burn-in per video, 0 means the cores divided by parallel_threads
+
+    parser.add_argument("--burn_profile", type=str, default="default", choices=burn_profiles.keys())
+    # Encoding profile of hard burn-in: codec, preset, crf, threads and subtitle style, audio is stream copied
+
+    parser.add_argument("--smart_render", type=str, default="False")
+    # Re-encode only the GOPs with a subtitle on screen and stream copy the others, for h264, hevc and vp9 video
+
     parser.add_argument("--parallel_threads", type=int, default=4)
     # Processing videos in parallel
 
+    parser.add_argument("--max_inflight", type=int, default=0)
+    # Videos in progress at once, including those waiting on Speech/Translate operations
+    # If larger than parallel_threads, only parallel_threads videos do local work at a time, 0 means disable
+
+    parser.add_argument("--transfer_slice_size", type=int, default=64)
+    # MB, objects larger than it are downloaded as concurrent byte-range slices, and uploaded as parallel parts
+    # composed into one object
+
+    parser.add_argument("--transfer_parallel", type=int, default=8)
+    # Concurrent slices of one object, 1 means single stream transfers
+
+    parser.add_argument("--transfer_verify", type=str, default="True")
+    # Compare crc32c of the local file with the object after a sliced transfer
+
+    parser.add_argument("--incremental", type=str, default="True")
+    # Record copied and produced videos in a manifest in the tmp bucket, only new or changed videos are processed,
+    # or all of them again if the languages, formats, merge_sub_to_video or sub_mode changed
+    # False means copy and process every video of the bucket. Not used with two_step_convert
+
+    parser.add_argument("--job_state", type=str, default="NONE")
+    # SQLite file of job state e.g. jobs.sqlite, or gcs to keep it in the tmp bucket. Completed stages of each video
+    # (recognized, translated, subtitled) are recorded, and a rerun after a crash resumes each video
+    # at its first incomplete stage. NONE means disable. Not used with two_step_convert
+
+    parser.add_argument("--scratch_dir", type=str, default="scratch")
+    # Each video works in its own directory in it, removed when the video ends. Not used with two_step_convert
+    # and local_file, which work in the current directory
+
+    parser.add_argument("--disk_budget", type=int, default=0)
+    # GB of disk for the scratch directories, a video starts only when its estimated disk fits what is left
+    # 0 means 90% of the free disk of scratch_dir at start
+
+    parser.add_argument("--memory_budget", type=int, default=0)
+    # GB of memory for the videos in progress, 0 means 80% of the physical memory
+
     parser.add_argument("--local_file", type=str, default="NONE")
     # If set local_file (only one filename in the same path as this code), it will not list the bucket of the source
     # You still need to set a fake bucket name with --bucket para, it is for creating tmp and output bucket
@@ -259,6 +962,35 @@ def main():
     # "First" is output srt and don't delete the video
     # "Second" is hard-encode video and clean
 
+    parser.add_argument("--stream_upload", type=str, default="False")
+    # Pipe ffmpeg output (audio and video with subtitles) straight into GCS resumable upload, without local output files
+
+    parser.add_argument("--audio_profile", type=str, default="flac16k", choices=audio_profiles.keys())
+    # Audio extraction for Speech-to-Text: "flac16k" and "opus16k" downmix to mono 16 kHz, "source" keeps the original audio
+
+    parser.add_argument("--remote_input", type=str, default="NONE")
+    # Read source video from gs://-in with ranged HTTP reads instead of downloading it first
+    # "Proxy" through a local range-proxy with the GCS client, "Signed" through a V4 signed url
+
+    parser.add_argument("--chunk_max_time", type=int, default=0)
+    # Split audio at silence gaps into chunks of at most these seconds and recognize them in parallel, 0 means disable
+
+    parser.add_argument("--cache_size", type=int, default=0)
+    # MB of local cache for source video, audio and probe info, keyed by content and extraction parameters
+    # Least recently used files are evicted over this size, 0 means disable cache
+
+    parser.add_argument("--cache_dir", type=str, default=artifact_cache.cache_dir)
+
+    parser.add_argument("--live_input", type=str, default="NONE")
+    # Live/near-live mode: streaming recognition of a live url (rtmp/hls/srt) or local file,
+    # subtitles are appended to local srt and vtt files within seconds, then uploaded to output bucket at the end
+
+    parser.add_argument("--live_realtime", type=str, default="False")
+    # Read live_input file at native speed, to simulate a live event
+
+    parser.add_argument("--live_translate", type=str, default="True")
+    # Translate live cues as they arrive with the online translate API
+
     parser.add_argument("--gui", action='store_true')
     # Enable GUI
 
@@ -269,12 +1001,43 @@ def main():
     bucket_out = bucket_org + "-out"
     video_src_language_code = args.video_src_language
     translate_src_code = args.translate_src_language
-    translate_des_code = args.translate_des_language
+    translate_des_codes = [lang.strip() for lang in args.translate_des_language.split(",") if lang.strip()]
+    if not translate_des_codes:
+        parser.error("--translate_des_language needs at least one language")
+    if len(translate_des_codes) > 10:
+        parser.error("--translate_des_language supports up to 10 languages")
     translate_location = args.translate_location  # Traslate API running region
+    online_translate_chars = args.online_translate_chars
+    if args.translate_batch_window > 0:
+        translate_batcher = LocalBatcher(submit_translate_batch, args.translate_batch_window,
+                                         min(args.translate_batch_size, 100))
+    translation_memory.db_path = args.translation_memory
+    output_formats = [fmt.strip() for fmt in args.sub_formats.split(",") if fmt.strip()]
+    if not output_formats or any(fmt not in cues.sub_formats for fmt in output_formats):
+        parser.error(f"--sub_formats supports {','.join(cues.sub_formats)}")
     merge_sub_to_video = args.merge_sub_to_video.lower() == "true"  # Merge subtitle into video (Hard merge)
+    sub_mode = args.sub_mode
+    burn_segments = args.burn_segments
+    burn_workers = args.burn_workers
+    burn_profile = args.burn_profile
+    smart_render = args.smart_render.lower() == "true"
     parallel_threads = args.parallel_threads  # Concurrent processing threads
+    max_inflight = args.max_inflight  # Concurrent videos including waiting on remote operations
     local_file = args.local_file
     two_step_convert = args.two_step_convert
+    stream_upload = args.stream_upload.lower() == "true"
+    audio_profile = args.audio_profile
+    remote_input = args.remote_input
+    chunk_max_time = args.chunk_max_time
+    live_input = args.live_input
+    live_realtime = args.live_realtime.lower() == "true"
+    live_translate = args.live_translate.lower() == "true"
+    artifact_cache.cache_size = args.cache_size * 1024 * 1024
+    transfer.slice_size = args.transfer_slice_size * 1024 * 1024
+    transfer.parallel = args.transfer_parallel
+    transfer.verify = args.transfer_verify.lower() == "true"
+    artifact_cache.cache_dir = args.cache_dir
+    scratch_dir = args.scratch_dir
 
     # Set GUI
     if platform.uname()[0] == 'Windows':
@@ -293,9 +1056,8 @@ def main():
             Bucket_txt.current(0)
         
         def ListObjects(bucket):
-            objects = storage_client.list_blobs(bucket)
-            objects_list = [o.name for o in objects]
-            return len(objects_list)
+            # Same listing as the videos to process afterwards
+            return len(bulk.list_blobs(storage_client, bucket))
 
         window = Tk()
         window.title("Translate video with caption")
@@ -355,25 +1117,51 @@ def main():
 
     # Create tmp and output bucket
     create_bucket([bucket_tmp, bucket_out, bucket_in], bucket_org)
+    job_state.configure(args.job_state, storage_client, bucket_tmp)
+
+    if live_input != "NONE":
+        live_video(live_input)
+        return
 
     # List files on bucket and change special character
     if local_file == "NONE":
+        if args.incremental.lower() == "true" and two_step_convert.lower() == "false":
+            manifest = Manifest(storage_client, bucket_tmp, output_config())
         file_list = bucket_file_name(bucket_org)
     else:
-        file_list = [local_file]
-        
+        file_list = [(local_file, os.path.getsize(local_file) if os.path.exists(local_file) else 0)]
+
+    # Admit videos by the disk and memory budget, each in its own scratch directory
+    if local_file == "NONE" and two_step_convert.lower() == "false":
+        os.makedirs(scratch_dir, exist_ok=True)
+        admission.clean_stale(scratch_dir)
+        disk = args.disk_budget * 1024 ** 3 or admission.disk_free(scratch_dir) * 0.9
+        memory = args.memory_budget * 1024 ** 3 or (admission.memory_total() or 0) * 0.8 or float("inf")
+        budget = admission.Budget(disk, memory)
+        print(f"Admission budget: disk {disk / 1024 ** 3:.1f} GB, memory {memory / 1024 ** 3:.1f} GB")
+
     # Pallaral process
-    with futures.ThreadPoolExecutor(max_workers=parallel_threads) as pool:
-        for filename in file_list:
+    # With max_inflight, up to max_inflight videos wait on remote operations polled by one event loop,
+    # while parallel_threads of them do local work
+    workers = parallel_threads
+    if max_inflight > parallel_threads:
+        lro_engine.start(parallel_threads)
+        workers = max_inflight
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for filename, size in file_list:
             if os.path.splitext(filename)[1] in support_format:
-                pool.submit(process_video, filename)
+                pool.submit(process_video_slot, filename, size)
             else:
                 print("Not support format, skip...", filename)
 
     print(f"! Finished all subtitiles and videos output to gs://{bucket_out}")
+    if manifest is not None:
+        manifest.save()
+    translation_memory.report()
+    burn_in.report()
 
     # Compare source bucket and output bucket
-    compare_bucket(bucket_in, bucket_out, translate_des_code)
+    compare_bucket(bucket_in, bucket_out, translate_des_codes)
     return
 
 def cloudrun_entry(bucket, filename):
@@ -381,15 +1169,34 @@ def cloudrun_entry(bucket, filename):
     While deploy to CloudRun, there should be Environment variables:
     video_src_language_code: en-US
     translate_src_code: en
-    translate_des_code: zh
+    translate_des_code: zh  # or up to 10 languages separated by comma, e.g. zh,ja,ko
     merge_sub_to_video: False
+    sub_mode: hard  # or soft, custom metadata sub_mode of the uploaded video overrides it
+    burn_segments: 0
+    burn_profile: default  # or fast, quality, hevc, vp9
+    smart_render: False
+    transfer_slice_size: 64  # MB
+    transfer_parallel: 8
+    transfer_verify: True
+    job_state: NONE  # or gcs, a retried event resumes the video at its first incomplete stage
+    scratch_dir: scratch  # Each event works in its own directory in it, removed when the video ends
     two_step_convert: False
+    stream_upload: True
+    audio_profile: flac16k
+    remote_input: Proxy
+    chunk_max_time: 300
+    cache_size: 0
+    online_translate_chars: 20000
+    translation_memory: NONE
+    translate_batch_window: 0  # Seconds, events within the same window share one batch translate operation
+    translate_batch_size: 100
+    sub_formats: srt  # or any of srt,vtt,ass,ttml separated by comma
     """
     if os.path.splitext(filename)[1] not in support_format:
         print("Not support format:", filename)
         return
 
-    global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_code, translate_location, merge_sub_to_video, two_step_convert, parallel_threads, local_file
+    global bucket_org, bucket_in, bucket_tmp, bucket_out, video_src_language_code, translate_src_code, translate_des_codes, translate_location, merge_sub_to_video, two_step_convert, parallel_threads, local_file, stream_upload, audio_profile, remote_input, chunk_max_time, max_inflight, live_input, live_realtime, live_translate, online_translate_chars, translate_batcher, output_formats, sub_mode, burn_segments, burn_workers, burn_profile, smart_render, manifest, scratch_dir, budget
     
     bucket_org = bucket
     bucket_in = bucket_org + "-in"
@@ -398,9 +1205,38 @@ def cloudrun_entry(bucket, filename):
     create_bucket([bucket_tmp, bucket_out, bucket_in], bucket)
     video_src_language_code = os.environ.get("video_src_language_code")
     translate_src_code = os.environ.get("translate_src_code")
-    translate_des_code = os.environ.get("translate_des_code")
-    merge_sub_to_video = os.environ.get("merge_sub_to_video").lower == "true"
+    translate_des_codes = [lang.strip() for lang in os.environ.get("translate_des_code", "").split(",") if lang.strip()][:10]
+    if not translate_des_codes:
+        print("ERROR while reading environment variable translate_des_code: no language", filename)
+        return
+    online_translate_chars = int(os.environ.get("online_translate_chars", "20000"))
+    translation_memory.db_path = os.environ.get("translation_memory", "NONE")
+    job_state.configure(os.environ.get("job_state", "NONE"), storage_client, bucket_tmp)
+    batch_window = int(os.environ.get("translate_batch_window", "0"))
+    if batch_window > 0:
+        # Staging folder in gs://tmp is shared by all instances
+        translate_batcher = GcsBatcher(storage_client, bucket_tmp, submit_translate_batch, batch_window,
+                                       min(int(os.environ.get("translate_batch_size", "100")), 100))
+    else:
+        translate_batcher = None
+    output_formats = [fmt.strip() for fmt in os.environ.get("sub_formats", "srt").split(",")
+                      if fmt.strip() in cues.sub_formats] or ["srt"]
+    merge_sub_to_video = os.environ.get("merge_sub_to_video").lower() == "true"
+    sub_mode = os.environ.get("sub_mode", "hard").lower()
+    burn_segments = int(os.environ.get("burn_segments", "0"))
+    burn_workers = 0
+    burn_profile = os.environ.get("burn_profile", "default")
+    smart_render = os.environ.get("smart_render", "False").lower() == "true"
     two_step_convert = os.environ.get("two_step_convert")
+    stream_upload = os.environ.get("stream_upload", "False").lower() == "true"
+    audio_profile = os.environ.get("audio_profile", "flac16k")
+    remote_input = os.environ.get("remote_input", "NONE")
+    chunk_max_time = int(os.environ.get("chunk_max_time", "0"))
+    artifact_cache.cache_size = int(os.environ.get("cache_size", "0")) * 1024 * 1024
+    transfer.slice_size = int(os.environ.get("transfer_slice_size", "64")) * 1024 * 1024
+    transfer.parallel = int(os.environ.get("transfer_parallel", "8"))
+    transfer.verify = os.environ.get("transfer_verify", "True").lower() == "true"
+    scratch_dir = os.environ.get("scratch_dir", "scratch")
     parallel_threads = 1
     local_file = "NONE"
     
@@ -408,13 +1244,10 @@ def cloudrun_entry(bucket, filename):
     filename_old = filename
     if re.search(rstr, filename):
         filename = re.sub(rstr, "_", filename)
-    source_bucket = storage_client.bucket(bucket_org)
-    source_blob = source_bucket.blob(filename_old)
-    destination_bucket = storage_client.bucket(bucket_in)
-    source_bucket.copy_blob(
-        source_blob, destination_bucket, filename
-    )
+    bulk.copy_object(storage_client, bucket_org, filename_old, bucket_in, filename)
     process_video(filename)
+    translation_memory.report()
+    burn_in.report()
 
 if __name__ == '__main__':
 
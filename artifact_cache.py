@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "trans_video_subs")
+cache_size = 0  # Budget of the cache in bytes, 0 means cache disabled
+cache_lock = threading.Lock()
+
+
+def enabled():
+    return cache_size > 0
+
+
+def make_key(*parts):
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf8")).hexdigest()
+
+
+def blob_key(blob):
+    # Content address of a GCS object, the same content under another name or bucket shares the key
+    return make_key("gcs", blob.crc32c, blob.md5_hash, blob.size)
+
+
+def file_key(filename):
+    # Local files have no checksum from GCS, use path, size and modified time
+    st = os.stat(filename)
+    return make_key("file", os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+
+
+def cache_path(key, suffix):
+    return os.path.join(cache_dir, key + suffix)
+
+
+def get(key, suffix):
+    # Return path of cached artifact and mark it as recently used, or None
+    path = cache_path(key, suffix)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def put(key, suffix, writer, localfile=None):
+    """
+    Create artifact with writer(tmp_path), move it into the cache atomically,
+    link it to localfile if set, then evict least recently used artifacts over the budget.
+    Return path of cached artifact
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(key, suffix)
+    tmp = cache_path(key, f".{uuid.uuid4().hex}.tmp")
+    try:
+        writer(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if localfile:
+        link(path, localfile)
+    evict()
+    return path
+
+
+def link(path, localfile):
+    # Hard link cached artifact to the working file, copy if the cache is on another file system
+    if os.path.exists(localfile):
+        os.remove(localfile)
+    try:
+        os.link(path, localfile)
+    except OSError:
+        shutil.copyfile(path, localfile)
+
+
+def get_json(key):
+    path = get(key, ".json")
+    if path is None:
+        return None
+    with open(path, encoding="utf8") as f:
+        return json.load(f)
+
+
+def put_json(key, data):
+    def writer(tmp):
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump(data, f)
+    put(key, ".json", writer)
+
+
+def evict():
+    # Delete least recently used artifacts until the cache fits in cache_size
+    with cache_lock:
+        entries = []
+        for f in os.listdir(cache_dir):
+            if f.endswith(".tmp"):
+                continue
+            path = os.path.join(cache_dir, f)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= cache_size:
+                break
+            print("Evict from cache:", path)
+            os.remove(path)
+            total -= size
@@ -0,0 +1,209 @@
+"""
+Local micro-benchmarks, no Google Cloud access needed
+python3 benchmark.py [video]
+The audio profile comparison needs ffmpeg, with a generated test audio if no video is given
+"""
+import datetime
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import srt
+from ffmpy import FFmpeg
+from google.cloud import speech_v1p1beta1 as speech
+
+from speech2txt import break_sentences, word_arrays, cue_ends
+from cues import CueList
+
+
+def make_words(count, seed=0):
+    # Fake recognized words as Speech-to-Text WordInfo, proto-plus messages with Duration time offsets
+    rnd = random.Random(seed)
+    vocab = ["the", "video", "caption", "translate", "cloud", "speech", "we", "are", "going", "to",
+             "show", "how", "it", "works", "today", "and", "then", "you", "can", "see"]
+    words = []
+    t = 0
+    for _ in range(count):
+        word = rnd.choice(vocab)
+        r = rnd.random()
+        if r < 0.06:
+            word += "."
+        elif r < 0.09:
+            word += ","
+        elif r < 0.1:
+            word += "?"
+        start = t + rnd.randint(0, 300)
+        end = start + rnd.randint(100, 900)
+        t = end
+        words.append(speech.WordInfo(word=word,
+                                     start_time=datetime.timedelta(milliseconds=start),
+                                     end_time=datetime.timedelta(milliseconds=end)))
+    return words
+
+
+def break_sentences_legacy(subs, alternative, max_chars=30, max_time=10):
+    # Word by word implementation before the columnar segmenter, for comparison
+    firstword = True
+    charcount = 0
+    idx = len(subs) + 1
+    content = ""
+    inter_count = 0
+    for w in alternative.words:
+        inter_count += 1
+        if firstword:
+            start_time = w.start_time.seconds
+            start_hhmmss = time.strftime('%H:%M:%S', time.gmtime(start_time))
+            start_ms = int(w.start_time.microseconds / 1000)
+            start = start_hhmmss + "," + str(start_ms)
+        end_time = w.end_time.seconds
+        end_hhmmss = time.strftime('%H:%M:%S', time.gmtime(end_time))
+        end_ms = int(w.end_time.microseconds / 1000)
+        end = end_hhmmss + "," + str(end_ms)
+        delta_time = end_time - start_time
+
+        if w.word.find("|"):
+            wd = w.word.split("|")[0]
+        else:
+            wd = w.word
+        charcount += len(wd)
+        content += " " + wd.strip()
+
+        if ("." in wd or "!" in wd or "?" in wd or
+                charcount > max_chars or
+                ("," in wd and not firstword) or
+                delta_time > max_time):
+            subs.append(srt.Subtitle(index=idx,
+                                     start=srt.srt_timestamp_to_timedelta(start),
+                                     end=srt.srt_timestamp_to_timedelta(end),
+                                     content=srt.make_legal_content(content)))
+            firstword = True
+            idx += 1
+            content = ""
+            charcount = 0
+        else:
+            firstword = False
+            if inter_count == len(alternative.words):
+                subs.append(srt.Subtitle(index=idx,
+                                         start=srt.srt_timestamp_to_timedelta(start),
+                                         end=srt.srt_timestamp_to_timedelta(end),
+                                         content=srt.make_legal_content(content)))
+    return subs
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        spent = time.perf_counter() - start
+        best = spent if best is None else min(best, spent)
+    return result, best
+
+
+def bench_break_sentences(count=50000):
+    alternative = SimpleNamespace(words=make_words(count))
+    legacy, legacy_time = timed(lambda: break_sentences_legacy([], alternative))
+    columnar, columnar_time = timed(lambda: break_sentences(CueList(), alternative))
+    arrays, arrays_time = timed(lambda: word_arrays(alternative.words))
+    _, boundary_time = timed(lambda: cue_ends(*arrays))
+    same = srt.compose(legacy, reindex=False) == "".join(columnar.srt_chunks())
+    print(f"break_sentences {count} words, {len(columnar)} cues: "
+          f"legacy {legacy_time * 1000:.1f} ms, columnar {columnar_time * 1000:.1f} ms "
+          f"(word arrays {arrays_time * 1000:.1f} ms, cue boundaries {boundary_time * 1000:.1f} ms), "
+          f"speedup {legacy_time / columnar_time:.1f}x, identical output: {same}")
+
+
+def allocated(build):
+    # Result of build() and the bytes it keeps allocated
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def write_compose(subs):
+    # Serializer before CueList: compose the whole text, then writelines over it
+    f = io.StringIO()
+    f.writelines(srt.compose(subs, strict=True))
+    return f.getvalue()
+
+
+def write_cues(cues):
+    f = io.StringIO()
+    cues.write_srt(f)
+    return f.getvalue()
+
+
+def bench_cue_store(count=20000):
+    words = make_words(count * 6)
+    alternative = SimpleNamespace(words=words)
+    cues = break_sentences(CueList(), alternative)[:count]
+
+    def build_subtitles():
+        return [srt.Subtitle(index=c.index, start=c.start, end=c.end, content=c.content) for c in cues]
+
+    def build_cues():
+        store = CueList()
+        for start, end, content in zip(cues.starts, cues.ends, cues.texts):
+            store.append(start, end, content)
+        return store
+
+    # Content strings are shared by both, so sizes are the cost of the containers
+    subs, subs_size = allocated(build_subtitles)
+    store, store_size = allocated(build_cues)
+    legacy, legacy_time = timed(lambda: write_compose(subs))
+    fast, fast_time = timed(lambda: write_cues(store))
+    print(f"cue store {len(store)} cues: srt.Subtitle list {subs_size / 1024:.0f} KB, "
+          f"CueList {store_size / 1024:.0f} KB ({subs_size / store_size:.1f}x smaller); "
+          f"write srt: compose + writelines {legacy_time * 1000:.1f} ms, "
+          f"CueList buffered {fast_time * 1000:.1f} ms, speedup {legacy_time / fast_time:.1f}x, "
+          f"identical output: {legacy == fast}")
+
+
+def bench_audio_profiles(source=None, seconds=600):
+    """
+    Size and extraction time of the audio of each profile, with the same ffmpeg options as audio_to_file.
+    source None means a generated 48 kHz stereo tone with noise of seconds, like the audio of a video
+    """
+    if shutil.which("ffmpeg") is None:
+        print("audio profiles: ffmpeg not found, skip")
+        return
+    # videosub makes a storage client at import, the emulator host lets it start without credentials
+    os.environ.setdefault("STORAGE_EMULATOR_HOST", "http://127.0.0.1:9")
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+    from videosub import audio_profiles
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if source is None:
+            source = os.path.join(tmp, "source.mkv")
+            FFmpeg(global_options="-loglevel error",
+                   inputs={f"sine=frequency=440:sample_rate=48000:duration={seconds}": "-f lavfi",
+                           f"anoisesrc=color=pink:sample_rate=48000:amplitude=0.1:duration={seconds}": "-f lavfi"},
+                   outputs={source: "-filter_complex amerge=inputs=2 -c:a pcm_s16le -y"}
+                   ).run()
+        sizes = {}
+        for name, profile in audio_profiles.items():
+            audio = os.path.join(tmp, f"audio.{name}{profile['ext']}")
+            ff = FFmpeg(inputs={source: None},
+                        outputs={audio: f"-vn {profile['options']} -f {profile['format']} -y -loglevel warning"}
+                        )
+            start = time.perf_counter()
+            ff.run()
+            spent = time.perf_counter() - start
+            sizes[name] = os.path.getsize(audio)
+            print(f"audio profile {name} ({profile['encoding']}): {sizes[name] / 1048576:.2f} MB, "
+                  f"{sizes['source'] / sizes[name]:.1f}x smaller than source, extracted in {spent * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    bench_break_sentences()
+    bench_cue_store()
+    bench_audio_profiles(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,123 @@
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from concurrent import futures
+import threading
+
+parallel = 16  # Concurrent batches of deletes or concurrent copies
+batch_size = 100  # Calls in one batch request, the limit of the JSON API
+# Properties of a listing used in this project, a smaller response per page of 1000 objects
+list_fields = "items(name,size,generation,md5Hash,crc32c),nextPageToken"
+
+listings = {}  # Bucket: list of Blob of one whole-bucket listing, shared by the callers of this run
+listing_locks = {}
+listings_lock = threading.Lock()
+worker = threading.local()
+delete_pool = None  # Long lived threads of batched deletes, each with its own client
+delete_pool_lock = threading.Lock()
+
+
+def list_blobs(client, bucket, prefix=None, refresh=False):
+    """
+    Blobs of bucket with name, size, generation, md5_hash and crc32c.
+    A whole-bucket listing is done once and shared by all callers, until refresh or a bulk copy or delete
+    in the bucket. Listings of a prefix are not shared.
+    """
+    if prefix:
+        return list(client.list_blobs(bucket, prefix=prefix, fields=list_fields))
+    with listings_lock:
+        lock = listing_locks.setdefault(bucket, threading.Lock())
+    with lock:  # Concurrent callers wait for the same pass
+        if refresh or bucket not in listings:
+            listings[bucket] = list(client.list_blobs(bucket, fields=list_fields))
+            print(f"Listed {len(listings[bucket])} objects of gs://{bucket}")
+        return listings[bucket]
+
+
+def forget(bucket):
+    with listings_lock:
+        listings.pop(bucket, None)
+
+
+def start(project, credentials=None):
+    """
+    Start the threads of batched deletes. A batch collects the calls of its client, so batches of other threads
+    must not share it: each thread makes one client when it starts and keeps it for the life of the process.
+    credentials None means the default credentials, same as storage.Client()
+    """
+    global delete_pool
+
+    def init():
+        worker.client = storage.Client(project=project, credentials=credentials)
+
+    with delete_pool_lock:
+        if delete_pool is None:
+            delete_pool = futures.ThreadPoolExecutor(max_workers=parallel, initializer=init)
+
+
+def delete_group(bucket, names):
+    c = worker.client
+    b = c.bucket(bucket)
+    try:
+        with c.batch():
+            for name in names:
+                b.delete_blob(name)
+    except Exception:
+        # A batch raises only its first failed call, so delete the group again one by one, which is idempotent
+        for name in names:
+            try:
+                b.delete_blob(name)
+            except NotFound:
+                pass
+
+
+def delete(client, bucket, names):
+    """
+    Delete the objects of names from bucket, batch_size deletes per request and parallel batches at a time.
+    Objects already deleted are ignored. Return the number of names.
+    The delete threads are started for the project of client if not started yet.
+    """
+    start(client.project)
+    groups = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+    list(delete_pool.map(lambda group: delete_group(bucket, group), groups))
+    forget(bucket)
+    return len(names)
+
+
+def copy_object(client, source_bucket, source_name, destination_bucket, destination_name):
+    # Rewrite until done, a large object or one across locations and storage classes takes several calls
+    source = client.bucket(source_bucket).blob(source_name)
+    destination = client.bucket(destination_bucket).blob(destination_name)
+    token, written, total = destination.rewrite(source)
+    while token is not None:
+        print(f"Copying gs://{source_bucket}/{source_name}: {written / 1048576:.0f} of {total / 1048576:.0f} MB")
+        token, written, total = destination.rewrite(source, token=token)
+
+
+def copy(client, source_bucket, destination_bucket, pairs):
+    """
+    Copy objects of pairs (source name, destination name) from source_bucket to destination_bucket,
+    parallel copies at a time. Return the set of source names that failed.
+    """
+    def copy_pair(pair):
+        try:
+            copy_object(client, source_bucket, pair[0], destination_bucket, pair[1])
+        except Exception as e:
+            print(f"ERROR while copying gs://{source_bucket}/{pair[0]}: ", e)
+            return pair[0]
+
+    with futures.ThreadPoolExecutor(max_workers=parallel) as pool:
+        failed = {name for name in pool.map(copy_pair, pairs) if name is not None}
+    forget(destination_bucket)
+    return failed
+
+
+def existing_buckets(client, prefix):
+    """
+    Dict of name: location of the buckets of the project starting with prefix, in one listing,
+    None if the buckets can't be listed, e.g. without storage.buckets.list permission.
+    """
+    try:
+        return {b.name: b.location for b in client.list_buckets(prefix=prefix)}
+    except Exception as e:
+        print(f"ERROR while listing buckets {prefix}: ", e)
+        return None
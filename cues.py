@@ -0,0 +1,209 @@
+from array import array
+from xml.sax.saxutils import escape
+import datetime
+import srt
+
+srt_buffer_size = 64 * 1024  # Characters of SRT text joined before each write
+sub_formats = ["srt", "vtt", "ass", "ttml"]
+# ASS style of burn-in, same look as ffmpeg subtitles filter of srt with force_style='Fontsize=24'
+ass_style = "Default,Arial,24,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,0"
+
+
+def srt_timestamp(ms):
+    # Same as srt.timedelta_to_srt_timestamp, from integer milliseconds
+    secs, ms = divmod(ms, 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
+    return f"{hrs:02d}:{mins:02d}:{secs:02d},{ms:03d}"
+
+
+def vtt_timestamp(ms):
+    secs, ms = divmod(ms, 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
+    return f"{hrs:02d}:{mins:02d}:{secs:02d}.{ms:03d}"
+
+
+def ass_timestamp(ms):
+    # H:MM:SS.cc in centiseconds
+    secs, ms = divmod(ms, 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
+    return f"{hrs:d}:{mins:02d}:{secs:02d}.{ms // 10:02d}"
+
+
+def sub_header(fmt, lang):
+    if fmt == "vtt":
+        return "WEBVTT\n\n"
+    if fmt == "ass":
+        return ("[Script Info]\nScriptType: v4.00+\nPlayResX: 384\nPlayResY: 288\nScaledBorderAndShadow: yes\n\n"
+                "[V4+ Styles]\nFormat: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, "
+                "BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, "
+                "Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+                f"Style: {ass_style}\n\n"
+                "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+    if fmt == "ttml":
+        return (f'<?xml version="1.0" encoding="utf-8"?>\n'
+                f'<tt xmlns="http://www.w3.org/ns/ttml" xml:lang="{lang}">\n<body>\n<div>\n')
+    return ""
+
+
+def sub_footer(fmt):
+    if fmt == "ttml":
+        return "</div>\n</body>\n</tt>\n"
+    return ""
+
+
+def sub_block(fmt, index, start_ms, end_ms, content):
+    # One cue in fmt, content is already legal srt content
+    if fmt == "srt":
+        return f"{index}\n{srt_timestamp(start_ms)} --> {srt_timestamp(end_ms)}\n{content}\n\n"
+    if fmt == "vtt":
+        return f"{vtt_timestamp(start_ms)} --> {vtt_timestamp(end_ms)}\n{content.strip()}\n\n"
+    if fmt == "ass":
+        text = content.strip().replace("\n", "\\N")
+        return f"Dialogue: 0,{ass_timestamp(start_ms)},{ass_timestamp(end_ms)},Default,,0,0,0,,{text}\n"
+    if fmt == "ttml":
+        text = escape(content.strip()).replace("\n", "<br/>")
+        return f'<p begin="{vtt_timestamp(start_ms)}" end="{vtt_timestamp(end_ms)}">{text}</p>\n'
+    raise ValueError(f"Unknown subtitle format {fmt}")
+
+
+class Cue:
+    """
+    One cue read from a CueList, with the attributes of srt.Subtitle used in this project
+    """
+    __slots__ = ("index", "start_ms", "end_ms", "content")
+
+    def __init__(self, index, start_ms, end_ms, content):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.content = content
+
+    @property
+    def start(self):
+        return datetime.timedelta(milliseconds=self.start_ms)
+
+    @property
+    def end(self):
+        return datetime.timedelta(milliseconds=self.end_ms)
+
+
+class CueList:
+    """
+    Compact cue store: start/end milliseconds in int64 arrays and the content in a list of strings,
+    instead of one srt.Subtitle with two timedelta per cue.
+    Translations share the time arrays of the original cues, only the strings are new.
+    first_index is the srt index of the first cue, for a slice of a longer list.
+    """
+    __slots__ = ("starts", "ends", "texts", "first_index")
+
+    def __init__(self, starts=None, ends=None, texts=None, first_index=1):
+        self.starts = starts if starts is not None else array("q")
+        self.ends = ends if ends is not None else array("q")
+        self.texts = texts if texts is not None else []
+        self.first_index = first_index
+
+    def append(self, start_ms, end_ms, content):
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.texts.append(content)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start = i.indices(len(self))[0]
+            return CueList(self.starts[i], self.ends[i], self.texts[i], self.first_index + start)
+        if i < 0:
+            i += len(self)
+        return Cue(self.first_index + i, self.starts[i], self.ends[i], self.texts[i])
+
+    def __iter__(self):
+        for i, (start, end, content) in enumerate(zip(self.starts, self.ends, self.texts), self.first_index):
+            yield Cue(i, start, end, content)
+
+    @classmethod
+    def from_subtitles(cls, subs):
+        # CueList of srt.Subtitle, e.g. parsed from an srt file edited by hand
+        cue_list = cls()
+        for s in subs:
+            cue_list.append(s.start // datetime.timedelta(milliseconds=1), s.end // datetime.timedelta(milliseconds=1),
+                            s.content)
+        return cue_list
+
+    def to_dict(self):
+        return {"starts": self.starts.tolist(), "ends": self.ends.tolist(), "texts": self.texts}
+
+    @classmethod
+    def from_dict(cls, data):
+        # Exact copy of a CueList saved with to_dict, e.g. as JSON
+        return cls(array("q", data["starts"]), array("q", data["ends"]), data["texts"])
+
+    def shifted(self, start_ms, end_ms):
+        # Cues overlapping [start_ms, end_ms), clipped to it and shifted so that start_ms is 0
+        cue_list = CueList()
+        for start, end, content in zip(self.starts, self.ends, self.texts):
+            if end > start_ms and start < end_ms:
+                cue_list.append(max(start, start_ms) - start_ms, min(end, end_ms) - start_ms, content)
+        return cue_list
+
+    def with_texts(self, lines):
+        # Same cues with other content, e.g. translated lines in the same order
+        return CueList(self.starts, self.ends, list(lines), self.first_index)
+
+    def srt_chunks(self, buffer_size=None):
+        """
+        Yield the SRT text in chunks of about buffer_size characters, same output as srt.compose(strict=True)
+        for cues in time order: empty and invalid cues are skipped and the others reindexed from first_index.
+        """
+        buffer_size = buffer_size or srt_buffer_size
+        buf = []
+        size = 0
+        index = self.first_index
+        for start, end, content in zip(self.starts, self.ends, self.texts):
+            if not content.strip() or start < 0 or start >= end:
+                continue
+            block = sub_block("srt", index, start, end, srt.make_legal_content(content))
+            index += 1
+            buf.append(block)
+            size += len(block)
+            if size >= buffer_size:
+                yield "".join(buf)
+                buf = []
+                size = 0
+        if buf:
+            yield "".join(buf)
+
+    def write_srt(self, f):
+        for chunk in self.srt_chunks():
+            f.write(chunk)
+
+    def write_formats(self, files, lang, buffer_size=None):
+        """
+        Write the cues into every format of files, dict of format: open text file, in a single pass.
+        Each file gets its buffered text about every buffer_size characters.
+        """
+        buffer_size = buffer_size or srt_buffer_size
+        bufs = {fmt: [sub_header(fmt, lang)] for fmt in files}
+        size = 0
+        index = self.first_index
+        for start, end, content in zip(self.starts, self.ends, self.texts):
+            if not content.strip() or start < 0 or start >= end:
+                continue
+            content = srt.make_legal_content(content)
+            for fmt, buf in bufs.items():
+                block = sub_block(fmt, index, start, end, content)
+                buf.append(block)
+                size += len(block)
+            index += 1
+            if size >= buffer_size:
+                for fmt, buf in bufs.items():
+                    files[fmt].write("".join(buf))
+                    buf.clear()
+                size = 0
+        for fmt, buf in bufs.items():
+            buf.append(sub_footer(fmt))
+            files[fmt].write("".join(buf))
@@ -0,0 +1,56 @@
+from google.api_core.exceptions import NotFound
+import json
+import threading
+import time
+
+manifest_object = "ingest-manifest.json"  # In gs://tmp, shared by the runs of the same bucket
+save_interval = 60  # Min seconds between two saves while videos are produced
+
+
+class Manifest:
+    """
+    Source objects by name, with generation and md5 of the copy in gs://in, its name there,
+    and the output config its outputs were produced with. Unchanged objects are not copied again,
+    and not processed again unless the output config changed.
+    config: hash of the output config of this run, e.g. languages, formats and subtitle mode
+    """
+    def __init__(self, storage_client, bucket, config=""):
+        self.blob = storage_client.bucket(bucket).blob(manifest_object)
+        self.config = config
+        self.lock = threading.Lock()
+        self.saved = time.time()
+        try:
+            self.entries = json.loads(self.blob.download_as_text())
+        except NotFound:
+            self.entries = {}
+        self.names = {e["filename"]: name for name, e in self.entries.items()}  # Name in gs://in: source name
+        print(f"Ingest manifest: {len(self.entries)} objects from gs://{bucket}/{manifest_object}")
+
+    def is_copied(self, blob):
+        e = self.entries.get(blob.name)
+        return e is not None and e["generation"] == blob.generation and e["md5"] == blob.md5_hash
+
+    def is_produced(self, blob):
+        return self.is_copied(blob) and self.entries[blob.name]["produced"] == self.config
+
+    def copied(self, blob, filename):
+        with self.lock:
+            self.entries[blob.name] = {"generation": blob.generation, "md5": blob.md5_hash, "filename": filename,
+                                       "produced": None}
+            self.names[filename] = blob.name
+
+    def produced(self, filename):
+        with self.lock:
+            name = self.names.get(filename)
+            if name is None:
+                return
+            self.entries[name]["produced"] = self.config
+            due = time.time() - self.saved > save_interval
+        if due:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.entries)
+            self.saved = time.time()
+        self.blob.upload_from_string(data, content_type="application/json")
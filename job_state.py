@@ -0,0 +1,81 @@
+from google.api_core.exceptions import NotFound
+import json
+import sqlite3
+import threading
+import time
+
+db_path = "NONE"  # SQLite file of job state, "gcs" means one JSON object per video in gs://tmp, "NONE" means disabled
+gcs_prefix = "job-state/"
+db_lock = threading.Lock()
+db = None
+gcs_bucket = None  # Bucket of the gcs mode, set by configure
+
+
+def enabled():
+    return db_path.upper() != "NONE"
+
+
+def configure(path, storage_client=None, bucket=None):
+    global db_path, gcs_bucket
+    db_path = path
+    if path.lower() == "gcs":
+        gcs_bucket = storage_client.bucket(bucket)
+
+
+def connect():
+    global db
+    if db is None:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                      video TEXT, source TEXT, stage TEXT, artifacts TEXT, updated REAL,
+                      PRIMARY KEY (video, stage))""")
+        db.commit()
+    return db
+
+
+def load(video, source):
+    """
+    Completed stages of the video, dict of stage: artifacts (URIs).
+    Stages recorded for another version of the source are discarded.
+    """
+    if db_path.lower() == "gcs":
+        try:
+            state = json.loads(gcs_bucket.blob(f"{gcs_prefix}{video}.json").download_as_text())
+        except NotFound:
+            return {}
+        return state["stages"] if state["source"] == source else {}
+    with db_lock:
+        rows = connect().execute("SELECT stage, artifacts FROM jobs WHERE video=? AND source=?", (video, source))
+        return {stage: json.loads(artifacts) for stage, artifacts in rows.fetchall()}
+
+
+def checkpoint(video, source, stage, artifacts):
+    # Record that stage of the video is completed with its artifacts, durable before returning
+    print(f"Checkpoint {video}: {stage}")
+    if db_path.lower() == "gcs":
+        stages = load(video, source)
+        stages[stage] = artifacts
+        gcs_bucket.blob(f"{gcs_prefix}{video}.json").upload_from_string(
+            json.dumps({"source": source, "stages": stages}), content_type="application/json")
+        return
+    with db_lock:
+        conn = connect()
+        conn.execute("DELETE FROM jobs WHERE video=? AND source!=?", (video, source))
+        conn.execute("INSERT OR REPLACE INTO jobs (video, source, stage, artifacts, updated) VALUES (?, ?, ?, ?, ?)",
+                     (video, source, stage, json.dumps(artifacts), time.time()))
+        conn.commit()
+
+
+def clear(video):
+    # All stages of the video are done, a later run processes it from the start
+    if db_path.lower() == "gcs":
+        try:
+            gcs_bucket.blob(f"{gcs_prefix}{video}.json").delete()
+        except NotFound:
+            pass
+        return
+    with db_lock:
+        conn = connect()
+        conn.execute("DELETE FROM jobs WHERE video=?", (video,))
+        conn.commit()
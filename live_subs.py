@@ -0,0 +1,146 @@
+from ffmpy import FFmpeg
+from concurrent import futures
+import datetime
+import os
+import srt
+from google.cloud import speech_v1p1beta1 as speech
+
+from speech2txt import speech_client, break_sentences
+from cues import CueList, sub_header, sub_block, sub_footer
+from translate import translate_lines
+
+sample_rate = 16000  # ffmpeg output of LINEAR16 mono PCM for streaming recognition
+read_size = sample_rate * 2 // 10  # 100 ms of audio per request
+stream_limit = 290  # Seconds of audio per streaming_recognize call, the API limit is about 5 mins
+
+
+class CueWriter:
+    """
+    Append cues to .srt and .vtt files as soon as they are finalized,
+    so players can read subtitles of an event that is still running.
+    Cues are written with the same serializers as CueList.write_formats, empty and invalid cues are skipped
+    and the srt index counts only the written cues.
+    """
+    def __init__(self, out_file, lang, formats=("srt", "vtt")):
+        self.files = []
+        self.index = 1  # srt index of the next written cue
+        for fmt in formats:
+            filename = f"{out_file}.{lang}.{fmt}"
+            print("Writing live subtitles to:", filename)
+            f = open(filename, "w", encoding="utf8")
+            f.write(sub_header(fmt, lang))
+            self.files.append((fmt, f))
+
+    def write(self, subs):
+        valid = [s for s in subs if s.content.strip() and 0 <= s.start_ms < s.end_ms]
+        for fmt, f in self.files:
+            f.write("".join(sub_block(fmt, self.index + i, s.start_ms, s.end_ms, srt.make_legal_content(s.content))
+                            for i, s in enumerate(valid)))
+            f.flush()
+        self.index += len(valid)
+
+    def close(self):
+        for fmt, f in self.files:
+            f.write(sub_footer(fmt))
+            f.close()
+
+    def filenames(self):
+        return [f.name for fmt, f in self.files]
+
+
+def streaming_config(language_code):
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=sample_rate,
+        audio_channel_count=1,
+        language_code=language_code,
+        enable_word_time_offsets=True,
+        enable_automatic_punctuation=True,
+    )
+    # TODO : Video model now only support en-US
+    if language_code == 'en-US':
+        config.use_enhanced = True
+        config.model = "video"
+    return speech.StreamingRecognitionConfig(config=config, interim_results=False)
+
+
+def live_recognize(source, language_code, out_file, project_id=None, translate_src_code=None, translate_des_codes=(),
+                   realtime=False):
+    """
+    Pipe ffmpeg PCM of the source (file, or live url e.g. rtmp/hls/srt) into streaming recognition.
+    Finalized results go through break_sentences and the new cues are appended to srt/vtt at once,
+    and translated with translate_text to each of translate_des_codes.
+    A stream is restarted every stream_limit seconds of audio, word offsets continue on the source timeline.
+    realtime: read file source at native speed (-re), to simulate a live event
+    Return list of the written files
+    """
+    client = speech_client()
+    config = streaming_config(language_code)
+    writer = CueWriter(out_file, language_code)
+    trans_writers = {lang: CueWriter(out_file, lang) for lang in translate_des_codes}
+
+    ff = FFmpeg(inputs={source: "-re" if realtime else None},
+                outputs={'pipe:1': f"-vn -ac 1 -ar {sample_rate} -acodec pcm_s16le -f s16le -loglevel warning"}
+                )
+    print(ff.cmd)
+    r, w = os.pipe()
+    subs = CueList()
+    offset = 0.0  # Seconds of audio sent in previous streams
+    try:
+        with futures.ThreadPoolExecutor(max_workers=1) as ff_thread:
+            ff_run = ff_thread.submit(ff.run, stdout=w)
+            ff_run.add_done_callback(lambda _: os.close(w))
+            with os.fdopen(r, 'rb') as pcm:
+                while True:
+                    first = pcm.read(read_size)
+                    if not first:
+                        break
+                    sent = [len(first)]
+
+                    def requests():
+                        yield speech.StreamingRecognizeRequest(audio_content=first)
+                        while sent[0] < stream_limit * sample_rate * 2:
+                            data = pcm.read(read_size)
+                            if not data:
+                                return
+                            sent[0] += len(data)
+                            yield speech.StreamingRecognizeRequest(audio_content=data)
+
+                    shift = datetime.timedelta(seconds=offset)
+                    for response in client.streaming_recognize(config, requests()):
+                        for result in response.results:
+                            if not result.is_final or not result.alternatives:
+                                continue
+                            alternative = result.alternatives[0]
+                            for word in alternative.words:
+                                word.start_time = word.start_time + shift
+                                word.end_time = word.end_time + shift
+                            n = len(subs)
+                            subs = break_sentences(subs, alternative)
+                            new_subs = subs[n:]
+                            writer.write(new_subs)
+                            for lang, trans_writer in trans_writers.items():
+                                if new_subs:
+                                    translate_cues(new_subs, trans_writer, project_id, translate_src_code, lang)
+                    offset += sent[0] / (sample_rate * 2)
+            ff_run.result()
+    except Exception as e:
+        print(f"ERROR while live_recognize {source}: ", e)
+    finally:
+        writer.close()
+        for trans_writer in trans_writers.values():
+            trans_writer.close()
+    print(f"Live subtitles finished, {len(subs)} cues of {offset:.1f} seconds: {source}")
+    files = writer.filenames()
+    for trans_writer in trans_writers.values():
+        files += trans_writer.filenames()
+    return files
+
+
+def translate_cues(subs, trans_writer, project_id, source_lang, target_lang):
+    try:
+        lines = translate_lines([t.strip() for t in subs.texts], project_id, source_lang, target_lang)
+    except Exception as e:
+        print("ERROR while translating live cues: ", e)
+        return
+    trans_writer.write(subs.with_texts(lines))
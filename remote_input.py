@@ -0,0 +1,112 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+import datetime
+import re
+import threading
+
+import google.auth
+from google.auth.transport import requests as auth_requests
+
+proxy_chunk_size = 8 * 1024 * 1024  # Bytes per ranged read from GCS
+proxy_server = None
+proxy_lock = threading.Lock()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serve gs://bucket/object as http://127.0.0.1:port/bucket/object with HTTP Range support,
+    so ffmpeg/ffprobe only read the byte ranges they need from GCS.
+    """
+    storage_client = None
+
+    def do_HEAD(self):
+        self.send_object(head=True)
+
+    def do_GET(self):
+        self.send_object()
+
+    def send_object(self, head=False):
+        bucket, name = unquote(self.path.lstrip("/")).split("/", 1)
+        blob = self.storage_client.bucket(bucket).get_blob(name)
+        if blob is None:
+            self.send_error(404)
+            return
+        size = blob.size
+
+        start, end = 0, size - 1
+        m = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                if m.group(2):
+                    end = min(int(m.group(2)), size - 1)
+            else:
+                start = max(size - int(m.group(2)), 0)  # Suffix range: last N bytes
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Type", "application/octet-stream")
+        self.end_headers()
+        if head:
+            return
+
+        try:
+            with blob.open("rb", chunk_size=proxy_chunk_size) as reader:
+                reader.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = reader.read(min(proxy_chunk_size, remaining))
+                    if not data:
+                        break
+                    self.wfile.write(data)
+                    remaining -= len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg closes the connection when it seeks to another range
+
+    def log_message(self, format, *args):
+        return
+
+
+def proxy_url(storage_client, bucket, filename):
+    # Start the local range-proxy once per process and return the url of the object
+    global proxy_server
+    with proxy_lock:
+        if proxy_server is None:
+            RangeHandler.storage_client = storage_client
+            proxy_server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+            proxy_server.daemon_threads = True
+            threading.Thread(target=proxy_server.serve_forever, daemon=True).start()
+            print("Range-proxy for remote input on port", proxy_server.server_port)
+    return f"http://127.0.0.1:{proxy_server.server_port}/{quote(bucket)}/{quote(filename)}"
+
+
+def signed_url(storage_client, bucket, filename, expiration=datetime.timedelta(hours=12)):
+    # V4 signed url. Without a private key (e.g. GCE/Cloud Run default credentials), sign with IAM signBlob
+    blob = storage_client.bucket(bucket).blob(filename)
+    try:
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET")
+    except AttributeError:
+        credentials, _ = google.auth.default()
+        credentials.refresh(auth_requests.Request())
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET",
+                                        service_account_email=credentials.service_account_email,
+                                        access_token=credentials.token)
+
+
+def remote_url(storage_client, bucket, filename, mode):
+    """
+    Url for ffmpeg/ffprobe to read gs://bucket/filename with ranged HTTP reads instead of a local copy
+    mode: "proxy" through the local range-proxy, works with STORAGE_EMULATOR_HOST as well
+          "signed" through a V4 signed url directly to GCS
+    """
+    if mode.lower() == "signed":
+        return signed_url(storage_client, bucket, filename)
+    return proxy_url(storage_client, bucket, filename)
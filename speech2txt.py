@@ -1,14 +1,31 @@
 from google.cloud.storage import retry
 import srt
-import time
 import datetime
+import numpy as np
+import os
+import grpc
+import functools
 from google.cloud import speech_v1p1beta1 as speech
+from google.cloud.speech_v1p1beta1.services.speech.transports import SpeechGrpcTransport
 
+import lro_engine
+from cues import CueList
 
-def long_running_recognize(sample_rate, channels, language_code, storage_uri):
+
+@functools.lru_cache(maxsize=None)
+def speech_client():
+    # One client per process, its gRPC channel stays warm and is shared by all threads
+    # SPEECH_EMULATOR_HOST points the client to a local fake server without TLS, e.g. localhost:8085
+    host = os.environ.get("SPEECH_EMULATOR_HOST")
+    if host:
+        return speech.SpeechClient(transport=SpeechGrpcTransport(channel=grpc.insecure_channel(host)))
+    return speech.SpeechClient()
+
+
+def recognize_results(sample_rate, channels, language_code, storage_uri, encoding="FLAC", offset=0, timeout=3600):
     """
     Transcribe long audio file from Cloud Storage using asynchronous speech
-    recognition
+    recognition, return the list of results
 
     Args:
       storage_uri URI for audio file in GCS, e.g. gs://[BUCKET]/[FILE]
@@ -16,13 +33,16 @@ def long_running_recognize(sample_rate, channels, language_code, storage_uri):
       channels of audio, e.g. 2
       language_code of audio, e.g. en-US
         # Speech to text language code: https://cloud.google.com/speech-to-text/docs/languages
+      encoding of audio, e.g. FLAC or OGG_OPUS
+      offset in seconds of this audio in the whole video, word time offsets are shifted by it
+      timeout in seconds to wait for the operation
     """
     start_time = datetime.datetime.now()
     print("Transcribing... {} ".format(storage_uri))
-    client = speech.SpeechClient()
+    client = speech_client()
 
     # Encoding of audio data sent, recommended to use loseless codec. Here should match ffmpeg output codec
-    encoding = speech.RecognitionConfig.AudioEncoding.FLAC
+    encoding = speech.RecognitionConfig.AudioEncoding[encoding]
     # Supported encoding: https://cloud.google.com/speech-to-text/docs/encoding#audio-encodings
 
     config = {
@@ -48,101 +68,133 @@ def long_running_recognize(sample_rate, channels, language_code, storage_uri):
                 "audio": audio,
             }
         )
-        response = operation.result(timeout=3600)
+        response = lro_engine.wait(operation, timeout)
         spent_time = str(datetime.datetime.now() - start_time)
         print(f"Transcrbed with Time {spent_time}, {storage_uri}")
-        
-        subs = []
-
-        if "results" in response:
-            for result in response.results:
-                # First alternative is the most probable result
-                subs = break_sentences(subs, result.alternatives[0])
-        print("Finished break_sentences")
+
+        results = list(response.results) if "results" in response else []
+        if offset:
+            # Shift word time offsets from the chunk back to the timeline of the whole video
+            shift = datetime.timedelta(seconds=offset)
+            for result in results:
+                for w in result.alternatives[0].words:
+                    w.start_time = w.start_time + shift
+                    w.end_time = w.end_time + shift
     except Exception as e:
         print(f"ERROR while transcribing {storage_uri}: ", e)
         return "ERR"
+    return results
+
+
+def long_running_recognize(sample_rate, channels, language_code, storage_uri, encoding="FLAC"):
+    results = recognize_results(sample_rate, channels, language_code, storage_uri, encoding)
+    if results == "ERR":
+        return "ERR"
+    subs = stitch_results([results])
     return subs
 
 
-def break_sentences(subs, alternative, max_chars=30, max_time=10):
-    firstword = True
-    charcount = 0
-    idx = len(subs) + 1
-    content = ""
-    inter_count = 0
-    for w in alternative.words:
-        inter_count += 1
-        if firstword:
-            # first word in sentence, record start time
-            start_time = w.start_time.seconds
-            start_hhmmss = time.strftime('%H:%M:%S', time.gmtime(start_time))
-            start_ms = int(w.start_time.microseconds / 1000)
-            start = start_hhmmss + "," + str(start_ms)
-        end_time = w.end_time.seconds
-        end_hhmmss = time.strftime('%H:%M:%S', time.gmtime(end_time))
-        end_ms = int(w.end_time.microseconds / 1000)
-        end = end_hhmmss + "," + str(end_ms)
-        delta_time = end_time - start_time
-
-        if w.word.find("|"):
-            wd = w.word.split("|")[0]
+def stitch_results(chunk_results):
+    # Break sentences over the results of all chunks in time order, cue index continues across chunks
+    subs = CueList()
+    for results in chunk_results:
+        for result in results:
+            # First alternative is the most probable result
+            subs = break_sentences(subs, result.alternatives[0])
+    print("Finished break_sentences")
+    return subs
+
+
+def word_arrays(words):
+    """
+    Convert recognized words to compact arrays: display token, token length,
+    start/end time in milliseconds and in whole seconds, in one pass over the words.
+    Time offsets of proto-plus words are read once from the protobuf Durations, without building timedelta
+    """
+    n = len(words)
+    pb = getattr(type(words[0]), "pb", None) if n else None
+    tokens = []
+    starts = []
+    ends = []
+    for w in words:
+        if pb is not None:
+            raw = pb(w)
+            word, start, end = raw.word, raw.start_time, raw.end_time
+            starts.append(start.seconds * 1000 + start.nanos // 1000000)
+            ends.append(end.seconds * 1000 + end.nanos // 1000000)
+        else:
+            # Words with timedelta offsets
+            word, start, end = w.word, w.start_time, w.end_time
+            starts.append(start.seconds * 1000 + start.microseconds // 1000)
+            ends.append(end.seconds * 1000 + end.microseconds // 1000)
+        if "|" in word:
             """
             Japanese would have hiragana(left) and katakana(right) in the same word for choosing, splitted by "｜"
             日文包括片假名和平假名，识别结果以｜为划分，左边是平假名，右边是对应的片假名，实际上是同一个意思，
             需要从结果中选择｜左边或者右边作为最终结果；逗号区分同一个意思的不同片假名表述；空格划分每个词 / 词组。
             """
-        else:
-            wd = w.word
-        charcount += len(wd)
-        content += " " + wd.strip()
-
-        if ("." in wd or "!" in wd or "?" in wd or
-                charcount > max_chars or
-                ("," in wd and not firstword) or
-                delta_time > max_time):
-            # break sentence at: . ! ? or line length exceeded or max time exceeded
-            subs.append(srt.Subtitle(index=idx,
-                                     start=srt.srt_timestamp_to_timedelta(start),
-                                     end=srt.srt_timestamp_to_timedelta(end),
-                                     content=srt.make_legal_content(content)))
-            firstword = True
-            idx += 1
-            content = ""
-            charcount = 0
-        else:
-            firstword = False
-            if inter_count == len(alternative.words):
-                # End sentence, but no end sign. 结尾不是结束符的句子，要加入subs
-                subs.append(srt.Subtitle(index=idx,
-                                         start=srt.srt_timestamp_to_timedelta(start),
-                                         end=srt.srt_timestamp_to_timedelta(end),
-                                         content=srt.make_legal_content(content)))
-    return subs
-
+            word = word.split("|")[0]
+        tokens.append(word)
+    start_ms = np.array(starts, dtype=np.int64)
+    end_ms = np.array(ends, dtype=np.int64)
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=n)
+    return tokens, lengths, start_ms, end_ms
 
-def write_srt(out_file, language_code, subs):
-    srt_file = f"{out_file}.{language_code}.srt"
-    print("Writing subtitles to: {}".format(srt_file))
-    with open(srt_file, 'w', encoding="utf8") as f:
-        f.writelines(srt.compose(subs))
-    return
 
+def cue_ends(tokens, lengths, start_ms, end_ms, max_chars=30, max_time=10):
+    """
+    For every word i, the index of the last word of a cue starting at i, computed in batch.
+    A cue breaks at . ! ? , (comma not at first word), over max_chars characters,
+    over max_time whole seconds, or at the last word.
+    """
+    n = len(tokens)
+    idx = np.arange(n)
+    tok = np.array(tokens, dtype=str)
+    stop = np.flatnonzero((np.char.find(tok, ".") >= 0) | (np.char.find(tok, "!") >= 0) | (np.char.find(tok, "?") >= 0))
+    comma = np.flatnonzero(np.char.find(tok, ",") >= 0)
+
+    # First stop sign at or after i, first comma after i
+    next_stop = np.append(stop, n)[np.searchsorted(stop, idx, side="left")]
+    next_comma = np.append(comma, n)[np.searchsorted(comma, idx, side="right")]
+
+    # First word whose characters counted from i are over max_chars
+    cum_chars = np.cumsum(lengths)
+    next_chars = np.searchsorted(cum_chars, cum_chars - lengths + max_chars, side="right")
+
+    # First word whose end is over max_time seconds from the start of i, in whole seconds
+    start_s = start_ms // 1000
+    end_s = end_ms // 1000
+    limit_s = start_s + max_time
+    next_time = np.searchsorted(np.maximum.accumulate(end_s), limit_s, side="right")
+    for i in np.flatnonzero(next_time < idx):
+        # An earlier word ends after this limit, search from i only
+        over = np.flatnonzero(end_s[i:] > limit_s[i])
+        next_time[i] = i + over[0] if len(over) else n
+
+    ends = np.minimum(np.minimum(next_stop, next_comma), np.minimum(next_chars, next_time))
+    return np.minimum(ends, n - 1)
 
-def write_txt(out_file, language_code, subs):
-    txt_file = f"{out_file}.{language_code}.txt"
-    print("Writing text to: {}".format(txt_file))
-    with open(txt_file, 'w', encoding="utf8") as f:
-        for s in subs:
-            f.write(s.content.strip() + "\n")
-    return
 
+def break_sentences(subs, alternative, max_chars=30, max_time=10):
+    # Append the cues of the words of alternative to the CueList subs
+    words = alternative.words
+    if len(words) == 0:
+        return subs
+    tokens, lengths, start_ms, end_ms = word_arrays(words)
+    ends = cue_ends(tokens, lengths, start_ms, end_ms, max_chars, max_time).tolist()
+    stripped = [t.strip() for t in tokens]
+    start_ms = start_ms.tolist()
+    end_ms = end_ms.tolist()
+
+    i = 0
+    while i < len(ends):
+        j = ends[i]
+        # break sentence at: . ! ? or line length exceeded or max time exceeded, or end sentence without end sign
+        subs.append(start_ms[i], end_ms[j], srt.make_legal_content(" " + " ".join(stripped[i:j + 1])))
+        i = j + 1
+    return subs
 
-def speech2txt(sample_rate, channels, language_code, storage_uri, out_file):
-    subs = long_running_recognize(sample_rate, channels, language_code, storage_uri)
-    if subs == "ERR":
-        return "ERR"
-    write_srt(out_file, language_code, subs)
-    write_txt(out_file, language_code, subs)
-    return
 
+def speech2txt(sample_rate, channels, language_code, storage_uri, encoding="FLAC"):
+    # Recognize the audio into a list of cues, which stays in memory through translation and txt2srt
+    return long_running_recognize(sample_rate, channels, language_code, storage_uri, encoding)
@@ -0,0 +1,160 @@
+"""
+Behavior checks of the local logic, no Google Cloud access needed
+python3 -m pytest tests
+"""
+from contextlib import contextmanager
+from types import SimpleNamespace
+import base64
+import hashlib
+import itertools
+import os
+import sys
+
+import pytest
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# videosub makes a storage client at import, the emulator host lets it start without credentials
+os.environ.setdefault("STORAGE_EMULATOR_HOST", "http://127.0.0.1:9")
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "test-project")
+
+
+class FakeWriter:
+    # Resumable upload of blob.open("wb"), the object exists only after close
+    def __init__(self, blob):
+        self.blob = blob
+        self.data = b""
+        self.writes = 0
+
+    def write(self, data):
+        self.data += data
+        self.writes += 1
+
+    def close(self):
+        self.blob.client.put(self.blob.key, self.data)
+
+
+class FakeBlob:
+    """
+    Object of FakeClient with the calls used in this project, content in client.objects["bucket/name"] as bytes.
+    Listed blobs carry size, generation, md5_hash and crc32c of the stored content.
+    """
+    def __init__(self, client, bucket, name):
+        self.client = client
+        self.bucket = bucket
+        self.name = name
+        self.writer = None
+        self.crc32c = None
+        self.size = None
+        self.generation = None
+        self.md5_hash = None
+
+    @property
+    def key(self):
+        return f"{self.bucket.name}/{self.name}"
+
+    def exists(self):
+        return self.key in self.client.objects
+
+    def reload(self):
+        self.size = len(self.download_as_bytes())
+        self.generation = self.client.generations[self.key]
+        self.md5_hash = base64.b64encode(hashlib.md5(self.client.objects[self.key]).digest()).decode("utf8")
+
+    def download_as_bytes(self):
+        if self.key not in self.client.objects:
+            raise NotFound(self.key)
+        return self.client.objects[self.key]
+
+    def download_as_text(self):
+        return self.download_as_bytes().decode("utf8")
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if if_generation_match == 0 and self.exists():
+            raise PreconditionFailed(self.key)
+        self.client.put(self.key, data.encode("utf8") if isinstance(data, str) else data)
+
+    def open(self, mode, chunk_size=None, content_type=None):
+        self.writer = FakeWriter(self)
+        return self.writer
+
+    def delete(self):
+        if self.client.objects.pop(self.key, None) is None:
+            raise NotFound(self.key)
+        self.client.deleted.append(self.key)
+
+    def compose(self, sources):
+        self.client.put(self.key, b"".join(s.download_as_bytes() for s in sources))
+
+    def rewrite(self, source, token=None):
+        # Copy in client.rewrite_calls calls, like a large object across locations
+        data = source.download_as_bytes()
+        step = (token or 0) + 1
+        if step < self.client.rewrite_calls:
+            return step, len(data) * step // self.client.rewrite_calls, len(data)
+        self.client.put(self.key, data)
+        return None, len(data), len(data)
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def blob(self, name):
+        b = FakeBlob(self.client, self, name)
+        self.client.blobs.append(b)
+        return b
+
+    def delete_blob(self, name):
+        FakeBlob(self.client, self, name).delete()
+
+
+class FakeClient:
+    """
+    In-memory storage.Client of one project. objects holds the content by "bucket/name",
+    blobs every blob handle made and deleted the keys deleted, in order.
+    """
+    def __init__(self, project="test-project"):
+        self.project = project
+        self.objects = {}
+        self.generations = {}
+        self.blobs = []
+        self.deleted = []
+        self.buckets = {}  # Name: location of list_buckets
+        self.list_calls = 0
+        self.rewrite_calls = 1
+        self.counter = itertools.count(1)
+
+    def put(self, key, data):
+        self.objects[key] = data
+        self.generations[key] = next(self.counter)
+
+    def bucket(self, name):
+        return FakeBucket(self, name)
+
+    def list_blobs(self, bucket, prefix=None, fields=None, max_results=None):
+        self.list_calls += 1
+        bucket = self.bucket(bucket) if isinstance(bucket, str) else bucket
+        names = sorted(key[len(bucket.name) + 1:] for key in self.objects if key.startswith(f"{bucket.name}/"))
+        listed = []
+        for name in names:
+            if prefix and not name.startswith(prefix):
+                continue
+            b = FakeBlob(self, bucket, name)
+            b.reload()
+            listed.append(b)
+        return iter(listed[:max_results])
+
+    def list_buckets(self, prefix=None):
+        return iter([SimpleNamespace(name=name, location=location) for name, location in self.buckets.items()
+                     if name.startswith(prefix or "")])
+
+    @contextmanager
+    def batch(self):
+        yield
+
+
+@pytest.fixture
+def gcs():
+    return FakeClient()
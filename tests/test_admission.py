@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+import admission
+
+MB = 1024 * 1024
+
+
+def admitted_later(budget, name, disk, memory, order, hold=None):
+    # Thread admitted in budget, appends name to order when admitted and holds the budget until hold is set
+    def run():
+        with budget.admit(name, disk, memory):
+            order.append(name)
+            if hold is not None:
+                hold.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_jobs_within_budget_run_together():
+    budget = admission.Budget(10 * MB, 10 * MB)
+    with budget.admit("a", 4 * MB, 4 * MB):
+        with budget.admit("b", 4 * MB, 4 * MB):
+            assert budget.free_disk == 2 * MB
+    assert budget.free_disk == 10 * MB and budget.free_memory == 10 * MB
+
+
+def test_job_waits_until_budget_is_released():
+    budget = admission.Budget(10 * MB, 10 * MB)
+    order = []
+    release = threading.Event()
+    first = admitted_later(budget, "a", 8 * MB, 1 * MB, order, release)
+    time.sleep(0.05)
+    second = admitted_later(budget, "b", 4 * MB, 1 * MB, order)
+    time.sleep(0.05)
+    assert order == ["a"]
+    release.set()
+    first.join(2)
+    second.join(2)
+    assert order == ["a", "b"]
+
+
+def test_memory_is_also_a_limit():
+    budget = admission.Budget(100 * MB, 10 * MB)
+    order = []
+    release = threading.Event()
+    first = admitted_later(budget, "a", 1 * MB, 8 * MB, order, release)
+    time.sleep(0.05)
+    second = admitted_later(budget, "b", 1 * MB, 4 * MB, order)
+    time.sleep(0.05)
+    assert order == ["a"]
+    release.set()
+    first.join(2)
+    second.join(2)
+    assert order == ["a", "b"]
+
+
+def test_arrival_order_is_kept():
+    # A large job waiting is not passed by a small one arriving after it
+    budget = admission.Budget(10 * MB, 10 * MB)
+    order = []
+    release = threading.Event()
+    first = admitted_later(budget, "a", 6 * MB, 1 * MB, order, release)
+    time.sleep(0.05)
+    large = admitted_later(budget, "large", 8 * MB, 1 * MB, order)
+    time.sleep(0.05)
+    small = admitted_later(budget, "small", 1 * MB, 1 * MB, order)
+    time.sleep(0.05)
+    assert order == ["a"]
+    release.set()
+    for thread in (first, large, small):
+        thread.join(2)
+    assert order == ["a", "large", "small"]
+
+
+def test_job_larger_than_budget_runs_alone():
+    budget = admission.Budget(10 * MB, 10 * MB)
+    with budget.admit("huge", 50 * MB, 1 * MB):
+        assert budget.free_disk == 0
+    assert budget.free_disk == 10 * MB
+
+
+def test_scratch_is_unique_and_removed(tmp_path):
+    a = admission.make_scratch(str(tmp_path), "video")
+    b = admission.make_scratch(str(tmp_path), "video")
+    assert a != b
+    with open(os.path.join(a, "video.mp4"), "w") as f:
+        f.write("x")
+    admission.remove_scratch(a)
+    assert not os.path.exists(a)
+    assert os.listdir(tmp_path) == [os.path.basename(b)]
+    admission.remove_scratch(a)  # Already removed
+
+
+def test_clean_stale_keeps_other_entries(tmp_path):
+    stale = admission.make_scratch(str(tmp_path), "video")
+    os.makedirs(str(tmp_path / "job-old.trash"))
+    os.makedirs(str(tmp_path / "keep"))
+    (tmp_path / "job-file").write_text("not a directory")
+    admission.clean_stale(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["job-file", "keep"]
+    assert not os.path.exists(stale)
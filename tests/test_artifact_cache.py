@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+import artifact_cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifact_cache, "cache_dir", str(tmp_path / "cache"))
+    monkeypatch.setattr(artifact_cache, "cache_size", 1000)
+    return tmp_path
+
+
+def writer(data):
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(data)
+    return write
+
+
+def age(path, seconds):
+    st = os.stat(path)
+    os.utime(path, (st.st_atime - seconds, st.st_mtime - seconds))
+
+
+def test_put_then_get(cache):
+    key = artifact_cache.make_key("gcs", "crc", "md5", 3)
+    assert artifact_cache.get(key, ".flac") is None
+    path = artifact_cache.put(key, ".flac", writer(b"abc"))
+    assert artifact_cache.get(key, ".flac") == path
+    assert open(path, "rb").read() == b"abc"
+    assert os.listdir(artifact_cache.cache_dir) == [key + ".flac"]
+
+
+def test_failed_writer_leaves_nothing(cache):
+    def fail(tmp):
+        writer(b"partial")(tmp)
+        raise RuntimeError("ffmpeg failed")
+    with pytest.raises(RuntimeError):
+        artifact_cache.put("k", ".flac", fail)
+    assert os.listdir(artifact_cache.cache_dir) == []
+
+
+def test_put_links_the_working_file(cache):
+    local = cache / "work.flac"
+    local.write_bytes(b"old")
+    path = artifact_cache.put("k", ".flac", writer(b"new"), str(local))
+    assert local.read_bytes() == b"new"
+    assert os.path.samefile(path, local)
+
+
+def test_link_copies_across_file_systems(cache, monkeypatch):
+    path = artifact_cache.put("k", ".flac", writer(b"abc"))
+
+    def cross_device(src, dst):
+        raise OSError(18, "Invalid cross-device link")
+    monkeypatch.setattr(os, "link", cross_device)
+    artifact_cache.link(path, str(cache / "copy.flac"))
+    assert (cache / "copy.flac").read_bytes() == b"abc"
+    assert not os.path.samefile(path, cache / "copy.flac")
+
+
+def test_evict_least_recently_used(cache):
+    old = artifact_cache.put("old", ".bin", writer(b"o" * 400))
+    used = artifact_cache.put("used", ".bin", writer(b"u" * 400))
+    age(old, 20)
+    age(used, 30)
+    assert artifact_cache.get("used", ".bin") == used  # Recently used again
+    artifact_cache.put("new", ".bin", writer(b"n" * 400))
+    assert sorted(os.listdir(artifact_cache.cache_dir)) == ["new.bin", "used.bin"]
+
+
+def test_json_round_trip(cache):
+    assert artifact_cache.get_json("transcript") is None
+    artifact_cache.put_json("transcript", {"lines": ["a", "b"]})
+    assert artifact_cache.get_json("transcript") == {"lines": ["a", "b"]}
+
+
+def test_keys():
+    assert artifact_cache.make_key("a", 1) == artifact_cache.make_key("a", "1")
+    assert artifact_cache.make_key("a", 1) != artifact_cache.make_key("a", 2)
+
+
+def test_blob_key_is_content_address(gcs):
+    gcs.bucket("in").blob("a.mp4").upload_from_string("same")
+    gcs.bucket("in2").blob("b.mp4").upload_from_string("same")
+    gcs.bucket("in").blob("c.mp4").upload_from_string("other")
+    a, b, c = [next(gcs.list_blobs(bucket, prefix=name)) for bucket, name in
+               [("in", "a.mp4"), ("in2", "b.mp4"), ("in", "c.mp4")]]
+    assert artifact_cache.blob_key(a) == artifact_cache.blob_key(b) != artifact_cache.blob_key(c)
@@ -0,0 +1,23 @@
+from audio_chunks import split_chunks
+
+
+def test_short_audio_is_one_chunk():
+    assert split_chunks(100, [(10, 11)], 300) == [(0.0, 100)]
+
+
+def test_cut_at_middle_of_last_gap_in_second_half():
+    chunks = split_chunks(500, [(100, 102), (200, 202), (250, 252)], 300)
+    assert chunks == [(0.0, 251.0), (251.0, 500)]
+
+
+def test_gap_in_first_half_is_not_used():
+    chunks = split_chunks(500, [(100, 102)], 300)
+    assert chunks == [(0.0, 300.0), (300.0, 500)]
+
+
+def test_chunks_cover_timeline_within_max_time():
+    silences = [(t, t + 1) for t in range(37, 3600, 53)]
+    chunks = split_chunks(3600, silences, 300)
+    assert chunks[0][0] == 0 and chunks[-1][1] == 3600
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(end - start <= 300 for start, end in chunks)
@@ -0,0 +1,103 @@
+import datetime
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+import srt
+from google.cloud import speech_v1p1beta1 as speech
+
+from cues import CueList
+from speech2txt import break_sentences, word_arrays
+
+
+def loop_break_sentences(subs, alternative, max_chars=30, max_time=10):
+    # Word by word segmenter before the columnar one, with the "|" check fixed: the left side of any "|" is used
+    firstword = True
+    charcount = 0
+    idx = len(subs) + 1
+    content = ""
+    inter_count = 0
+    for w in alternative.words:
+        inter_count += 1
+        if firstword:
+            start_time = w.start_time.seconds
+            start = time.strftime('%H:%M:%S', time.gmtime(start_time)) + "," + str(int(w.start_time.microseconds / 1000))
+        end_time = w.end_time.seconds
+        end = time.strftime('%H:%M:%S', time.gmtime(end_time)) + "," + str(int(w.end_time.microseconds / 1000))
+        delta_time = end_time - start_time
+
+        wd = w.word.split("|")[0] if "|" in w.word else w.word
+        charcount += len(wd)
+        content += " " + wd.strip()
+
+        if ("." in wd or "!" in wd or "?" in wd or
+                charcount > max_chars or
+                ("," in wd and not firstword) or
+                delta_time > max_time):
+            subs.append(srt.Subtitle(index=idx, start=srt.srt_timestamp_to_timedelta(start),
+                                     end=srt.srt_timestamp_to_timedelta(end), content=srt.make_legal_content(content)))
+            firstword = True
+            idx += 1
+            content = ""
+            charcount = 0
+        else:
+            firstword = False
+            if inter_count == len(alternative.words):
+                subs.append(srt.Subtitle(index=idx, start=srt.srt_timestamp_to_timedelta(start),
+                                         end=srt.srt_timestamp_to_timedelta(end),
+                                         content=srt.make_legal_content(content)))
+    return subs
+
+
+def word(text, start_ms, end_ms, proto=True):
+    cls = speech.WordInfo if proto else SimpleNamespace
+    return cls(word=text, start_time=datetime.timedelta(milliseconds=start_ms),
+               end_time=datetime.timedelta(milliseconds=end_ms))
+
+
+def transcript(count=3000, seed=1, proto=True, offset=0):
+    # Words with . ! ? and commas, runs of long words over max_chars, long words over max_time,
+    # and Japanese words with "|" at the start, in the middle, or none
+    rnd = random.Random(seed)
+    vocab = ["the", "video", "caption", "extraordinarily", "we", "going", "きょう|キョウ", "|カナ", "は|ハ|ワ",
+             "ありがとう", "ok.", "right,", "what?", "yes!", "|"]
+    words = []
+    t = offset
+    for _ in range(count):
+        start = t + rnd.randint(0, 400)
+        end = start + rnd.choice([150, 600, 900, 4500])
+        t = end
+        words.append(word(rnd.choice(vocab), start, end, proto))
+    return SimpleNamespace(words=words)
+
+
+@pytest.mark.parametrize("proto", [True, False])
+@pytest.mark.parametrize("max_chars,max_time", [(30, 10), (12, 3), (200, 60)])
+def test_same_cues_as_word_loop(proto, max_chars, max_time):
+    alternative = transcript(proto=proto)
+    expected = srt.compose(loop_break_sentences([], alternative, max_chars, max_time))
+    columnar = break_sentences(CueList(), alternative, max_chars, max_time)
+    assert "".join(columnar.srt_chunks()) == expected
+
+
+def test_appends_to_existing_cues():
+    first = transcript(200, seed=2)
+    second = transcript(200, seed=3, offset=first.words[-1].end_time // datetime.timedelta(milliseconds=1))
+    expected = loop_break_sentences(loop_break_sentences([], first), second)
+    subs = break_sentences(break_sentences(CueList(), first), second)
+    assert "".join(subs.srt_chunks()) == srt.compose(expected)
+
+
+def test_left_side_of_bar_is_used():
+    words = [word("|カナ", 0, 100), word("きょう|キョウ", 100, 200), word("は|ハ|ワ", 200, 300), word("ok", 300, 400)]
+    tokens, lengths, start_ms, end_ms = word_arrays(words)
+    assert tokens == ["", "きょう", "は", "ok"]
+    assert lengths.tolist() == [0, 3, 1, 2]
+    assert start_ms.tolist() == [0, 100, 200, 300] and end_ms.tolist() == [100, 200, 300, 400]
+
+
+def test_empty_alternative():
+    subs = CueList()
+    assert break_sentences(subs, SimpleNamespace(words=[])) is subs
+    assert len(subs) == 0
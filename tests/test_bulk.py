@@ -0,0 +1,74 @@
+import pytest
+
+import bulk
+
+
+@pytest.fixture
+def store(monkeypatch, gcs):
+    # Delete threads get the fake client, listings and the pool do not outlive the test
+    monkeypatch.setattr(bulk, "listings", {})
+    monkeypatch.setattr(bulk, "delete_pool", None)
+    monkeypatch.setattr(bulk, "batch_size", 3)
+    monkeypatch.setattr(bulk.storage, "Client", lambda project=None, credentials=None: gcs)
+    for i in range(10):
+        gcs.bucket("in").blob(f"video{i}.mp4").upload_from_string(f"data {i}")
+    yield gcs
+    if bulk.delete_pool is not None:
+        bulk.delete_pool.shutdown()
+
+
+def names(blobs):
+    return [b.name for b in blobs]
+
+
+def test_listing_is_shared_until_refresh(store):
+    first = bulk.list_blobs(store, "in")
+    assert names(first) == [f"video{i}.mp4" for i in range(10)]
+    assert first[0].size == len("data 0") and first[0].md5_hash
+    store.bucket("in").blob("new.mp4").upload_from_string("new")
+    assert bulk.list_blobs(store, "in") is first
+    assert store.list_calls == 1
+    assert "new.mp4" in names(bulk.list_blobs(store, "in", refresh=True))
+    assert store.list_calls == 2
+
+
+def test_prefix_listing_is_not_shared(store):
+    assert names(bulk.list_blobs(store, "in", prefix="video1")) == ["video1.mp4"]
+    assert names(bulk.list_blobs(store, "in", prefix="video1")) == ["video1.mp4"]
+    assert store.list_calls == 2
+
+
+def test_delete_in_batches(store):
+    bulk.list_blobs(store, "in")
+    deleted = [f"video{i}.mp4" for i in range(8)] + ["missing.mp4"]
+    assert bulk.delete(store, "in", deleted) == 9
+    assert sorted(store.objects) == ["in/video8.mp4", "in/video9.mp4"]
+    # The listing of the bucket is made again after a delete
+    assert names(bulk.list_blobs(store, "in")) == ["video8.mp4", "video9.mp4"]
+
+
+def test_delete_pool_is_started_once(store):
+    bulk.delete(store, "in", ["video0.mp4"])
+    pool = bulk.delete_pool
+    bulk.delete(store, "in", ["video1.mp4"])
+    assert bulk.delete_pool is pool
+
+
+def test_copy_rewrites_until_done(store):
+    store.rewrite_calls = 3
+    bulk.list_blobs(store, "out")
+    failed = bulk.copy(store, "in", "out", [("video0.mp4", "a.mp4"), ("video1.mp4", "b.mp4"), ("gone.mp4", "c.mp4")])
+    assert failed == {"gone.mp4"}
+    assert store.objects["out/a.mp4"] == b"data 0" and store.objects["out/b.mp4"] == b"data 1"
+    assert "out/c.mp4" not in store.objects
+    assert names(bulk.list_blobs(store, "out")) == ["a.mp4", "b.mp4"]
+
+
+def test_existing_buckets(store, monkeypatch):
+    store.buckets = {"video-in": "US", "video-out": "US-CENTRAL1", "other": "EU"}
+    assert bulk.existing_buckets(store, "video-") == {"video-in": "US", "video-out": "US-CENTRAL1"}
+
+    def denied(prefix=None):
+        raise PermissionError("storage.buckets.list")
+    monkeypatch.setattr(store, "list_buckets", denied)
+    assert bulk.existing_buckets(store, "video-") is None
@@ -0,0 +1,96 @@
+import pytest
+
+import burn_in
+from cues import CueList
+
+
+def cue_list(*cues):
+    subs = CueList()
+    for start, end in cues:
+        subs.append(start, end, "text")
+    return subs
+
+
+def test_split_segments_cut_at_keyframes():
+    keys = [0.0, 2.0, 4.5, 6.0, 8.2]
+    assert burn_in.split_segments(10.0, keys, 2) == [(0.0, 6.0), (6.0, 10.0)]
+
+
+def test_split_segments_without_keyframe_after_cut():
+    assert burn_in.split_segments(10.0, [0.0, 1.0], 4) == [(0.0, 10.0)]
+
+
+def test_smart_segments_encode_only_gops_with_cues():
+    keys = [0.0, 2.0, 4.0, 6.0, 8.0]
+    subs = cue_list((2500, 3000), (6100, 6500))
+    segments = burn_in.smart_segments(10.0, keys, subs, [0.0])
+    assert segments == [(0.0, 2.0, False), (2.0, 4.0, True), (4.0, 6.0, False), (6.0, 8.0, True),
+                        (8.0, 10.0, False)]
+
+
+def test_smart_segments_long_cue_spans_gops():
+    keys = [0.0, 2.0, 4.0, 6.0]
+    # A cue starting early and ending late covers every GOP it overlaps, even with later short cues
+    subs = cue_list((1000, 5000), (1500, 1600))
+    segments = burn_in.smart_segments(8.0, keys, subs, [0.0])
+    assert segments == [(0.0, 6.0, True), (6.0, 8.0, False)]
+
+
+def test_smart_segments_not_merged_across_cuts():
+    keys = [0.0, 2.0, 4.0, 6.0]
+    segments = burn_in.smart_segments(8.0, keys, cue_list(), [0.0, 4.0])
+    assert segments == [(0.0, 4.0, False), (4.0, 8.0, False)]
+
+
+def test_smart_segments_cover_the_timeline():
+    keys = [i * 2.002 for i in range(50)]
+    subs = cue_list(*[(i * 3000, i * 3000 + 1200) for i in range(0, 33, 4)])
+    segments = burn_in.smart_segments(100.0, keys, subs, [0.0, 50.05])
+    assert segments[0][0] == 0.0 and segments[-1][1] == 100.0
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+
+class FakeFFprobe:
+    # ffprobe output by the entries asked for
+    outputs = {}
+
+    def __init__(self, global_options, inputs):
+        self.cmd = global_options
+
+    def run(self, stdout=None, stderr=None):
+        for entries, output in self.outputs.items():
+            if entries in self.cmd:
+                return output.encode("utf8"), b""
+        raise AssertionError(self.cmd)
+
+
+def test_keyframes_from_file_start(monkeypatch):
+    FakeFFprobe.outputs = {
+        "packet=pts_time,flags": "1.400000,K__\n1.433367,___\n11.410010,K__\nN/A,K__\n",
+        "format=start_time": "1.400000\n",
+    }
+    monkeypatch.setattr(burn_in, "FFprobe", FakeFFprobe)
+    assert burn_in.keyframes("video.mp4") == pytest.approx([0.0, 10.01001])
+
+
+def test_copy_segment_starts_at_exact_keyframe(monkeypatch):
+    commands = []
+
+    class FakeFFmpeg:
+        def __init__(self, global_options, inputs, outputs):
+            self.cmd = list(inputs.values())[0]
+            commands.append(self.cmd)
+
+        def run(self):
+            pass
+
+    monkeypatch.setattr(burn_in, "FFmpeg", FakeFFmpeg)
+    burn_in.burn_segment("video.mp4", 10.01001, 20.02002, "seg.ts", "-c:v copy")
+    assert commands == ["-ss 10.010010 -t 10.010010"]
+
+
+def test_encoder_threads_share_cores(monkeypatch):
+    monkeypatch.setattr(burn_in.os, "cpu_count", lambda: 32)
+    assert burn_in.encoder_threads(4) == 8
+    assert burn_in.encoder_threads(4, 4) == 2
+    assert burn_in.encoder_threads(64) == 1
@@ -0,0 +1,97 @@
+from xml.etree import ElementTree
+import datetime
+import random
+
+import pytest
+import srt
+
+import cues
+from cues import CueList
+
+
+def subtitles(count, seed):
+    # Subtitles in time order with empty, blank, zero length and backwards cues, and content srt must make legal
+    rnd = random.Random(seed)
+    texts = ["hello", "two\nlines", "", "   ", "blank\n\nline", "\n leading", "こんにちは", "a" * 80]
+    subs = []
+    start = 0
+    for i in range(count):
+        length = rnd.choice([0, -200, 800, 1500, 3000])
+        subs.append(srt.Subtitle(i + 1, datetime.timedelta(milliseconds=start),
+                                 datetime.timedelta(milliseconds=start + length), rnd.choice(texts)))
+        start += rnd.choice([500, 2000])
+    return subs
+
+
+@pytest.mark.parametrize("buffer_size", [1, 40, 200, None])
+def test_srt_chunks_same_as_compose(buffer_size):
+    subs = subtitles(300, buffer_size or 0)
+    chunks = list(CueList.from_subtitles(subs).srt_chunks(buffer_size))
+    assert "".join(chunks) == srt.compose(subs, strict=True)
+    if buffer_size == 1:
+        assert all(chunk.count(" --> ") == 1 for chunk in chunks)
+
+
+def test_srt_chunks_of_slice_start_at_its_index():
+    subs = [srt.Subtitle(i + 1, datetime.timedelta(seconds=i), datetime.timedelta(seconds=i + 1), f"line {i}")
+            for i in range(50)]
+    tail = list(srt.parse("".join(CueList.from_subtitles(subs)[20:].srt_chunks(40))))
+    assert [(s.index, s.content) for s in tail] == [(i + 1, f"line {i}") for i in range(20, 50)]
+
+
+def test_srt_chunks_all_invalid():
+    subs = [srt.Subtitle(1, datetime.timedelta(seconds=1), datetime.timedelta(seconds=1), "zero"),
+            srt.Subtitle(2, datetime.timedelta(seconds=2), datetime.timedelta(seconds=3), " \n ")]
+    assert list(CueList.from_subtitles(subs).srt_chunks()) == []
+    assert srt.compose(subs, strict=True) == ""
+
+
+def write_all(cue_list, tmp_path, buffer_size=None):
+    files = {fmt: open(tmp_path / f"v.zh.{fmt}", "w", encoding="utf8") for fmt in cues.sub_formats}
+    cue_list.write_formats(files, "zh", buffer_size)
+    for f in files.values():
+        f.close()
+    return {fmt: (tmp_path / f"v.zh.{fmt}").read_text(encoding="utf8") for fmt in cues.sub_formats}
+
+
+@pytest.fixture
+def sample():
+    cue_list = CueList()
+    cue_list.append(0, 1500, "Hello <world> & you")
+    cue_list.append(1500, 1500, "zero length")
+    cue_list.append(2000, 3000, "  ")
+    cue_list.append(3723004, 3725999, "two\nlines")
+    return cue_list
+
+
+def test_write_formats_vtt(sample, tmp_path):
+    assert write_all(sample, tmp_path)["vtt"] == ("WEBVTT\n\n"
+                                                  "00:00:00.000 --> 00:00:01.500\nHello <world> & you\n\n"
+                                                  "01:02:03.004 --> 01:02:05.999\ntwo\nlines\n\n")
+
+
+def test_write_formats_ass(sample, tmp_path):
+    ass = write_all(sample, tmp_path)["ass"]
+    assert ass.startswith(cues.sub_header("ass", "zh"))
+    assert f"Style: {cues.ass_style}\n" in ass
+    assert ass.endswith("Dialogue: 0,0:00:00.00,0:00:01.50,Default,,0,0,0,,Hello <world> & you\n"
+                        "Dialogue: 0,1:02:03.00,1:02:05.99,Default,,0,0,0,,two\\Nlines\n")
+
+
+def test_write_formats_ttml(sample, tmp_path):
+    ttml = write_all(sample, tmp_path)["ttml"]
+    root = ElementTree.fromstring(ttml)
+    assert root.get("{http://www.w3.org/XML/1998/namespace}lang") == "zh"
+    cues_p = root.findall(".//{http://www.w3.org/ns/ttml}p")
+    assert [(p.get("begin"), p.get("end"), "".join(p.itertext())) for p in cues_p] == [
+        ("00:00:00.000", "00:00:01.500", "Hello <world> & you"), ("01:02:03.004", "01:02:05.999", "twolines")]
+    assert "two<br/>lines" in ttml
+
+
+@pytest.mark.parametrize("buffer_size", [1, 100, None])
+def test_write_formats_srt_same_as_chunks(buffer_size, tmp_path):
+    cue_list = CueList.from_subtitles(subtitles(200, 3))
+    written = write_all(cue_list, tmp_path, buffer_size)
+    assert written["srt"] == "".join(cue_list.srt_chunks())
+    assert written["vtt"].count(" --> ") == written["srt"].count(" --> ")
+    assert written["ttml"].count("<p ") == written["srt"].count(" --> ")
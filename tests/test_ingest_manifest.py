@@ -0,0 +1,71 @@
+import json
+from types import SimpleNamespace
+
+import ingest_manifest
+from ingest_manifest import Manifest
+
+
+def source(name, generation=1, md5="md5"):
+    return SimpleNamespace(name=name, generation=generation, md5_hash=md5)
+
+
+def test_new_object_is_not_copied(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    assert not manifest.is_copied(source("a b.mp4"))
+    assert not manifest.is_produced(source("a b.mp4"))
+
+
+def test_copied_then_produced(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    manifest.copied(source("a b.mp4"), "a_b.mp4")
+    assert manifest.is_copied(source("a b.mp4"))
+    assert not manifest.is_produced(source("a b.mp4"))
+    manifest.produced("a_b.mp4")
+    assert manifest.is_produced(source("a b.mp4"))
+
+
+def test_changed_object_is_copied_again(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    manifest.copied(source("a.mp4"), "a.mp4")
+    manifest.produced("a.mp4")
+    assert not manifest.is_copied(source("a.mp4", generation=2))
+    assert not manifest.is_produced(source("a.mp4", md5="other"))
+
+
+def test_saved_manifest_is_loaded_by_next_run(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    manifest.copied(source("a.mp4"), "a.mp4")
+    manifest.produced("a.mp4")
+    manifest.save()
+    assert json.loads(gcs.objects[f"tmp/{ingest_manifest.manifest_object}"])["a.mp4"]["filename"] == "a.mp4"
+    assert Manifest(gcs, "tmp", "config").is_produced(source("a.mp4"))
+
+
+def test_other_output_config_is_not_produced(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    manifest.copied(source("a.mp4"), "a.mp4")
+    manifest.produced("a.mp4")
+    manifest.save()
+    rerun = Manifest(gcs, "tmp", "other config")
+    assert rerun.is_copied(source("a.mp4"))
+    assert not rerun.is_produced(source("a.mp4"))
+
+
+def test_produced_of_unknown_file_is_ignored(gcs):
+    manifest = Manifest(gcs, "tmp", "config")
+    manifest.produced("local.mp4")
+    assert manifest.entries == {}
+
+
+def test_output_config_changes_with_outputs(monkeypatch):
+    import videosub
+    monkeypatch.setattr(videosub, "video_src_language_code", "en-US", raising=False)
+    monkeypatch.setattr(videosub, "translate_des_codes", ["zh"], raising=False)
+    monkeypatch.setattr(videosub, "merge_sub_to_video", True, raising=False)
+    config = videosub.output_config()
+    assert videosub.output_config() == config
+    monkeypatch.setattr(videosub, "translate_des_codes", ["zh", "ja"], raising=False)
+    assert videosub.output_config() != config
+    monkeypatch.setattr(videosub, "translate_des_codes", ["zh"], raising=False)
+    monkeypatch.setattr(videosub, "output_formats", ["srt", "vtt"])
+    assert videosub.output_config() != config
@@ -0,0 +1,57 @@
+import pytest
+
+import job_state
+
+stages = [("recognized", {"cues": "gs://tmp/v.cues.json"}),
+          ("translated", {"lines": "gs://tmp/v.lines.json", "langs": ["zh", "ja"]}),
+          ("subtitled", {"formats": ["srt"]})]
+
+
+@pytest.fixture(params=["sqlite", "gcs"])
+def state(request, monkeypatch, tmp_path, gcs):
+    monkeypatch.setattr(job_state, "db", None)
+    monkeypatch.setattr(job_state, "gcs_bucket", None)
+    monkeypatch.setattr(job_state, "db_path", "NONE")
+    job_state.configure(str(tmp_path / "jobs.sqlite") if request.param == "sqlite" else "gcs", gcs, "tmp")
+    yield request.param
+    if job_state.db is not None:
+        job_state.db.close()
+
+
+def test_configure_none_is_disabled(monkeypatch):
+    monkeypatch.setattr(job_state, "db_path", "gcs")
+    job_state.configure("NONE")
+    assert not job_state.enabled()
+
+
+@pytest.mark.parametrize("completed", range(len(stages) + 1))
+def test_resume_after_each_stage(state, completed):
+    assert job_state.enabled()
+    for stage, artifacts in stages[:completed]:
+        job_state.checkpoint("v.mp4", "gen1", stage, artifacts)
+    # A retried run of the same source skips the completed stages
+    assert job_state.load("v.mp4", "gen1") == dict(stages[:completed])
+    assert job_state.load("other.mp4", "gen1") == {}
+
+
+def test_new_source_starts_over(state):
+    for stage, artifacts in stages[:2]:
+        job_state.checkpoint("v.mp4", "gen1", stage, artifacts)
+    assert job_state.load("v.mp4", "gen2") == {}
+    job_state.checkpoint("v.mp4", "gen2", *stages[0])
+    assert job_state.load("v.mp4", "gen2") == dict(stages[:1])
+    assert job_state.load("v.mp4", "gen1") == {}
+
+
+def test_clear_after_last_stage(state):
+    for stage, artifacts in stages:
+        job_state.checkpoint("v.mp4", "gen1", stage, artifacts)
+    job_state.clear("v.mp4")
+    assert job_state.load("v.mp4", "gen1") == {}
+    job_state.clear("v.mp4")  # Already cleared
+
+
+def test_gcs_state_is_one_object_per_video(state, gcs):
+    job_state.checkpoint("v.mp4", "gen1", *stages[0])
+    keys = [key for key in gcs.objects if key.startswith(f"tmp/{job_state.gcs_prefix}")]
+    assert keys == ([f"tmp/{job_state.gcs_prefix}v.mp4.json"] if state == "gcs" else [])
@@ -0,0 +1,31 @@
+from array import array
+
+import srt
+
+from cues import CueList
+from live_subs import CueWriter
+
+
+def cue_list(cues):
+    return CueList(array("q", [c[0] for c in cues]), array("q", [c[1] for c in cues]), [c[2] for c in cues])
+
+
+def test_skips_empty_and_invalid_cues(tmp_path):
+    writer = CueWriter(str(tmp_path / "live"), "en")
+    writer.write(cue_list([(0, 1000, "one"), (1000, 2000, "  "), (2000, 2000, "zero length")]))
+    writer.write(cue_list([(3000, 2500, "backwards"), (3000, 4000, "two"), (4000, 5000, "")]))
+    writer.close()
+    subs = list(srt.parse((tmp_path / "live.en.srt").read_text(encoding="utf8")))
+    assert [(s.index, s.content) for s in subs] == [(1, "one"), (2, "two")]
+    vtt = (tmp_path / "live.en.vtt").read_text(encoding="utf8")
+    assert "one" in vtt and "two" in vtt
+    assert "backwards" not in vtt and "zero length" not in vtt
+
+
+def test_same_srt_as_write_formats(tmp_path):
+    cues = [(0, 1000, "one"), (1000, 1500, ""), (1500, 2000, "two\nlines"), (2500, 2400, "bad")]
+    writer = CueWriter(str(tmp_path / "live"), "en", formats=("srt",))
+    writer.write(cue_list(cues[:2]))
+    writer.write(cue_list(cues[2:]))
+    writer.close()
+    assert (tmp_path / "live.en.srt").read_text(encoding="utf8") == "".join(cue_list(cues).srt_chunks())
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+import lro_engine
+
+
+class FakeOperation:
+    # Long running operation done after a number of polls
+    def __init__(self, polls, result="done"):
+        self.polls = polls
+        self.calls = 0
+        self._result = result
+
+    def done(self):
+        self.calls += 1
+        return self.calls >= self.polls
+
+    def result(self, timeout=None):
+        return self._result
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(lro_engine, "poll_initial", 0.01)
+    monkeypatch.setattr(lro_engine, "poll_max", 0.02)
+    monkeypatch.setattr(lro_engine, "engine", None)
+    monkeypatch.setattr(lro_engine, "cpu_slots", None)
+    lro_engine.start(1)
+    yield lro_engine
+    lro_engine.engine.loop.call_soon_threadsafe(lro_engine.engine.loop.stop)
+
+
+def test_wait_without_engine_blocks_on_operation(monkeypatch):
+    monkeypatch.setattr(lro_engine, "engine", None)
+    assert lro_engine.wait(FakeOperation(1, "ok")) == "ok"
+
+
+def test_wait_polls_until_done(engine):
+    operation = FakeOperation(3, "ok")
+    assert engine.wait(operation) == "ok"
+    assert operation.calls == 3
+
+
+def test_wait_timeout(engine):
+    with pytest.raises(TimeoutError):
+        engine.wait(FakeOperation(10 ** 6), timeout=0.05)
+
+
+def test_slot_is_free_while_waiting(engine):
+    # One cpu slot: a job waiting on its operation lets another job do local work
+    release = threading.Event()
+    other_ran = threading.Event()
+
+    class SlowOperation(FakeOperation):
+        def done(self):
+            return release.is_set()
+
+    def waiting_job():
+        with engine.job_slot():
+            engine.wait(SlowOperation(0))
+
+    def local_job():
+        with engine.job_slot():
+            other_ran.set()
+
+    waiting = threading.Thread(target=waiting_job)
+    waiting.start()
+    time.sleep(0.05)
+    local = threading.Thread(target=local_job)
+    local.start()
+    assert other_ran.wait(2)
+    release.set()
+    waiting.join(2)
+    local.join(2)
+    assert not waiting.is_alive()
+
+
+def test_released_slot_without_slot_is_noop(engine):
+    with engine.released_slot():
+        pass
+    assert engine.cpu_slots.acquire(blocking=False)
+    engine.cpu_slots.release()
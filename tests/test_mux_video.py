@@ -0,0 +1,33 @@
+import pytest
+
+import videosub
+
+
+class FakeFFmpeg:
+    commands = []
+
+    def __init__(self, inputs, outputs):
+        self.cmd = " ".join(list(inputs) + [" ".join([k, v]) for k, v in outputs.items()])
+        FakeFFmpeg.commands.append(self.cmd)
+
+    def run(self):
+        pass
+
+
+@pytest.mark.parametrize("lang, code", [("en", "eng"), ("zh", "zho"), ("zh-TW", "zho"), ("ja", "jpn"),
+                                        ("pt-PT", "por"), ("fil", "fil"), ("xx", "und")])
+def test_track_language(lang, code):
+    assert videosub.track_language(lang) == code
+
+
+def test_mux_tags_tracks_with_iso639_2(monkeypatch, tmp_path):
+    FakeFFmpeg.commands = []
+    monkeypatch.setattr(videosub, "FFmpeg", FakeFFmpeg)
+    monkeypatch.setattr(videosub, "upload", lambda *args: None)
+    monkeypatch.setattr(videosub, "stream_upload", False)
+    monkeypatch.setattr(videosub, "bucket_out", "out", raising=False)
+    monkeypatch.setattr(videosub, "translate_des_codes", ["zh-TW", "ko"], raising=False)
+    assert videosub.mux_video("in.mp4", "video.mp4", "video", str(tmp_path)) != "ERR"
+    cmd = FakeFFmpeg.commands[0]
+    assert "-metadata:s:s:0 language=zho -metadata:s:s:0 title=zh-TW" in cmd
+    assert "-metadata:s:s:1 language=kor -metadata:s:s:1 title=ko" in cmd
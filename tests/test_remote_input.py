@@ -0,0 +1,79 @@
+import io
+import urllib.error
+import urllib.request
+
+import pytest
+
+import remote_input
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+
+class FakeBlob:
+    size = len(DATA)
+
+    def open(self, mode, chunk_size=None):
+        return io.BytesIO(DATA)
+
+
+class FakeClient:
+    def bucket(self, name):
+        class Bucket:
+            def get_blob(self, blob_name):
+                return FakeBlob() if blob_name == "video.mp4" else None
+        return Bucket()
+
+
+@pytest.fixture(scope="module")
+def url():
+    return remote_input.proxy_url(FakeClient(), "in", "video.mp4")
+
+
+def get(url, range_header=None):
+    request = urllib.request.Request(url, headers={"Range": range_header} if range_header else {})
+    with urllib.request.urlopen(request) as response:
+        return response.status, response.headers, response.read()
+
+
+def test_whole_object(url):
+    status, headers, body = get(url)
+    assert status == 200
+    assert body == DATA
+    assert headers["Accept-Ranges"] == "bytes"
+
+
+def test_range(url):
+    status, headers, body = get(url, "bytes=100-199")
+    assert status == 206
+    assert body == DATA[100:200]
+    assert headers["Content-Range"] == f"bytes 100-199/{len(DATA)}"
+
+
+def test_open_range(url):
+    status, headers, body = get(url, "bytes=10000-")
+    assert status == 206
+    assert body == DATA[10000:]
+
+
+def test_range_end_past_size(url):
+    status, headers, body = get(url, "bytes=10200-20000")
+    assert body == DATA[10200:]
+    assert headers["Content-Range"] == f"bytes 10200-{len(DATA) - 1}/{len(DATA)}"
+
+
+def test_suffix_range(url):
+    status, headers, body = get(url, "bytes=-40")
+    assert status == 206
+    assert body == DATA[-40:]
+
+
+def test_unsatisfiable_range(url):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        get(url, f"bytes={len(DATA)}-")
+    assert e.value.code == 416
+
+
+def test_missing_object(url):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        get(url.replace("video.mp4", "other.mp4"))
+    assert e.value.code == 404
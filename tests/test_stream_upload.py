@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import videosub
+
+
+class FakeFFmpeg:
+    # ffmpeg writing data to its stdout, then failing if fail is set
+    cmd = "ffmpeg"
+
+    def __init__(self, data, fail=False):
+        self.data = data
+        self.fail = fail
+
+    def run(self, stdout=None):
+        view = memoryview(self.data)
+        while view:
+            written = os.write(stdout, view[:65536])
+            view = view[written:]
+        if self.fail:
+            raise RuntimeError("ffmpeg failed")
+
+
+@pytest.fixture
+def client(monkeypatch, gcs):
+    monkeypatch.setattr(videosub, "storage_client", gcs)
+    monkeypatch.setattr(videosub, "stream_chunk_size", 256 * 1024)
+    return gcs
+
+
+def test_stream_to_bucket_uploads_in_chunks(client):
+    data = os.urandom(1024 * 1024 + 123)
+    size = videosub.stream_to_bucket(FakeFFmpeg(data), "out", "video.mp4")
+    assert size == len(data)
+    assert client.objects["out/video.mp4"] == data
+    assert client.blobs[0].writer.writes >= len(data) // (256 * 1024)
+
+
+def test_stream_to_bucket_not_finalized_if_ffmpeg_fails(client):
+    with pytest.raises(RuntimeError):
+        videosub.stream_to_bucket(FakeFFmpeg(b"x" * 1000, fail=True), "out", "video.mp4")
+    assert "out/video.mp4" not in client.objects
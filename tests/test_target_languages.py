@@ -0,0 +1,28 @@
+import sys
+
+import pytest
+
+import videosub
+
+
+@pytest.fixture
+def saved_globals(monkeypatch):
+    # main and cloudrun_entry set these before the languages are checked
+    for name in ["bucket_org", "bucket_in", "bucket_tmp", "bucket_out", "video_src_language_code",
+                 "translate_src_code", "translate_des_codes"]:
+        monkeypatch.setattr(videosub, name, getattr(videosub, name, None), raising=False)
+
+
+@pytest.mark.parametrize("languages", ["", " , "])
+def test_main_rejects_empty_languages(saved_globals, monkeypatch, languages):
+    monkeypatch.setattr(sys, "argv", ["videosub.py", "--bucket", "b", "--translate_des_language", languages])
+    with pytest.raises(SystemExit) as e:
+        videosub.main()
+    assert e.value.code == 2
+
+
+def test_cloudrun_skips_event_without_languages(saved_globals, monkeypatch):
+    monkeypatch.setattr(videosub, "create_bucket", lambda *args: None)
+    monkeypatch.setenv("translate_des_code", "")
+    monkeypatch.setattr(videosub, "process_video", lambda *args: pytest.fail("video processed"))
+    assert videosub.cloudrun_entry("b", "video.mp4") is None
@@ -0,0 +1,62 @@
+import pytest
+
+import translation_memory
+import videosub
+
+
+@pytest.fixture
+def routes(monkeypatch, tmp_path):
+    # Record which path translates, each language gets the lines upper-cased with its code
+    calls = []
+
+    def fake(kind):
+        def translate(lines, out_file, *args):
+            calls.append((kind, list(lines)))
+            return {lang: [f"{lang}:{line.upper()}" for line in lines] for lang in videosub.translate_des_codes}
+        return translate
+
+    monkeypatch.setattr(videosub, "online_translate", fake("online"))
+    monkeypatch.setattr(videosub, "batch_translate", fake("batch"))
+    monkeypatch.setattr(videosub, "translate_des_codes", ["zh", "ja"], raising=False)
+    monkeypatch.setattr(videosub, "translate_src_code", "en", raising=False)
+    monkeypatch.setattr(videosub, "online_translate_chars", 20)
+    monkeypatch.setattr(translation_memory, "db_path", "NONE")
+    monkeypatch.setattr(translation_memory, "db", None)
+    return calls
+
+
+def test_short_transcript_is_translated_online(routes):
+    result = videosub.translate_video("v", ["hello", "world"])
+    assert routes == [("online", ["hello", "world"])]
+    assert result == {"zh": ["zh:HELLO", "zh:WORLD"], "ja": ["ja:HELLO", "ja:WORLD"]}
+
+
+def test_long_transcript_is_batch_translated(routes):
+    videosub.translate_video("v", ["a long line of the video", "another one"])
+    assert routes[0][0] == "batch"
+
+
+def test_zero_limit_always_batch(routes, monkeypatch):
+    monkeypatch.setattr(videosub, "online_translate_chars", 0)
+    videosub.translate_video("v", ["hi"])
+    assert routes[0][0] == "batch"
+
+
+def test_error_is_returned(routes, monkeypatch):
+    monkeypatch.setattr(videosub, "online_translate", lambda *args: "ERR")
+    assert videosub.translate_video("v", ["hi"]) == "ERR"
+
+
+def test_translation_memory_sends_only_new_lines(routes, monkeypatch, tmp_path):
+    monkeypatch.setattr(translation_memory, "db_path", str(tmp_path / "tm.sqlite"))
+    videosub.translate_video("v", ["hello", "hello ", "world"])
+    assert routes == [("online", ["hello", "world"])]
+    result = videosub.translate_video("v2", ["world", "new  line"])
+    assert routes[1] == ("online", ["new line"])
+    assert result["zh"] == ["zh:WORLD", "zh:NEW LINE"]
+
+
+def test_short_transcript_is_batched_with_batcher(routes, monkeypatch):
+    monkeypatch.setattr(videosub, "translate_batcher", object())
+    videosub.translate_video("v", ["hi"])
+    assert routes == [("batch", ["hi"])]
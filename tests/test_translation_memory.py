@@ -0,0 +1,54 @@
+import pytest
+
+import translation_memory
+
+
+@pytest.fixture
+def memory(monkeypatch, tmp_path):
+    monkeypatch.setattr(translation_memory, "db_path", str(tmp_path / "tm.sqlite"))
+    monkeypatch.setattr(translation_memory, "db", None)
+    for counter in ["lookup_lines", "hit_lines", "hit_chars"]:
+        monkeypatch.setattr(translation_memory, counter, 0)
+    yield
+    translation_memory.db.close()
+
+
+def test_normalize():
+    assert translation_memory.normalize("  a \t b\n") == "a b"
+
+
+def test_lookup_hits_stored_lines(memory):
+    assert translation_memory.lookup(["hello"], "en", "zh") == {}
+    translation_memory.store({"hello": "你好", "good  day": "unused"}, "en", "zh")
+    assert translation_memory.lookup([" hello ", "world"], "en", "zh") == {"hello": "你好"}
+    # Other language pairs do not share translations
+    assert translation_memory.lookup(["hello"], "en", "ja") == {}
+    assert translation_memory.lookup(["hello"], "fr", "zh") == {}
+
+
+def test_store_replaces_translation(memory):
+    translation_memory.store({"hello": "old"}, "en", "zh")
+    translation_memory.store({"hello": "new"}, "en", "zh")
+    assert translation_memory.lookup(["hello"], "en", "zh") == {"hello": "new"}
+
+
+def test_lookup_of_many_lines(memory):
+    lines = [f"line {i}" for i in range(1200)]
+    translation_memory.store({line: line.upper() for line in lines[::2]}, "en", "zh")
+    found = translation_memory.lookup(lines, "en", "zh")
+    assert found == {line: line.upper() for line in lines[::2]}
+
+
+def test_hit_rate(memory, capsys):
+    translation_memory.store({"hello": "你好"}, "en", "zh")
+    translation_memory.lookup(["hello", "hello  ", "world", "new"], "en", "zh")
+    assert (translation_memory.lookup_lines, translation_memory.hit_lines, translation_memory.hit_chars) == (4, 2, 10)
+    translation_memory.report()
+    assert "50.0% (2/4 lines), 10 characters not sent" in capsys.readouterr().out
+
+
+def test_no_report_when_disabled(monkeypatch, capsys):
+    monkeypatch.setattr(translation_memory, "db_path", "NONE")
+    monkeypatch.setattr(translation_memory, "lookup_lines", 5)
+    translation_memory.report()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,108 @@
+from concurrent import futures
+from google.api_core.exceptions import NotFound
+import base64
+import mimetypes
+import os
+import uuid
+
+import google_crc32c
+
+slice_size = 64 * 1024 * 1024  # Bytes per ranged download or uploaded part, smaller objects use one stream
+parallel = 8  # Concurrent slices of one object
+verify = True  # Compare crc32c of the local file with the object after a sliced transfer
+compose_limit = 32  # Max source objects of one compose request
+part_prefix = "tmp-upload/"  # Folder of the parts and intermediate objects of an upload, one subfolder per upload
+
+
+def file_crc32c(filename):
+    # Base64 crc32c of the file, same form as blob.crc32c
+    crc = google_crc32c.Checksum()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            crc.update(chunk)
+    return base64.b64encode(crc.digest()).decode("utf8")
+
+
+def check(blob, filename):
+    if verify and blob.crc32c and blob.crc32c != file_crc32c(filename):
+        raise ValueError(f"crc32c of {filename} does not match gs://{blob.bucket.name}/{blob.name}")
+
+
+def download(blob, localfile):
+    """
+    Download blob into localfile. Objects larger than slice_size are downloaded as concurrent byte-range slices,
+    each written at its offset of the preallocated file. blob should come from get_blob, so that size is known
+    and all slices read the same generation.
+    """
+    if blob.size is None:
+        blob.reload()
+    size = blob.size
+    if size <= slice_size or parallel <= 1:
+        blob.download_to_filename(localfile)
+        return
+    with open(localfile, "wb") as f:
+        f.truncate(size)
+
+    def fetch(start):
+        with open(localfile, "r+b") as f:
+            f.seek(start)
+            blob.download_to_file(f, start=start, end=min(start + slice_size, size) - 1)
+
+    with futures.ThreadPoolExecutor(max_workers=parallel) as pool:
+        list(pool.map(fetch, range(0, size, slice_size)))
+    check(blob, localfile)
+
+
+def compose(bucket, blob, parts, folder, temps):
+    """
+    Compose parts into blob, through intermediate objects in folder if there are more than compose_limit.
+    Each intermediate is added to temps before it is written, so the caller can delete them even if compose fails.
+    """
+    level = 0
+    while len(parts) > compose_limit:
+        groups = [parts[i:i + compose_limit] for i in range(0, len(parts), compose_limit)]
+        composed = []
+        for i, group in enumerate(groups):
+            c = bucket.blob(f"{folder}compose{level}-{i:05d}")
+            temps.append(c)
+            c.compose(group)
+            composed.append(c)
+        parts = composed
+        level += 1
+    blob.compose(parts)
+
+
+def upload(bucket, localfile, bucketfile):
+    """
+    Upload localfile to bucket. Files larger than slice_size are uploaded as parallel parts
+    to temporary objects under part_prefix, which are composed into bucketfile and deleted, also on failure.
+    """
+    blob = bucket.blob(bucketfile)
+    size = os.path.getsize(localfile)
+    if size <= slice_size or parallel <= 1:
+        blob.upload_from_filename(localfile)
+        return
+    folder = f"{part_prefix}{uuid.uuid4().hex}/"
+    parts = [bucket.blob(f"{folder}part{i:05d}") for i in range((size + slice_size - 1) // slice_size)]
+
+    def put(i):
+        with open(localfile, "rb") as f:
+            f.seek(i * slice_size)
+            parts[i].upload_from_file(f, size=min(slice_size, size - i * slice_size))
+
+    temps = []
+    try:
+        with futures.ThreadPoolExecutor(max_workers=parallel) as pool:
+            list(pool.map(put, range(len(parts))))
+        blob.content_type = mimetypes.guess_type(localfile)[0] or "application/octet-stream"
+        compose(bucket, blob, parts, folder, temps)
+    finally:
+        for b in parts + temps:
+            try:
+                b.delete()
+            except NotFound:
+                pass  # Not written before a failure
+            except Exception as e:
+                print(f"ERROR while deleting upload part {b.name}: ", e)
+    blob.reload()
+    check(blob, localfile)
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+
+db_path = "NONE"  # SQLite file of translation memory, "NONE" means disabled
+db_lock = threading.Lock()
+db = None
+lookup_lines = 0  # Lines looked up in this run
+hit_lines = 0  # Lines found in translation memory in this run
+hit_chars = 0  # Characters not sent to translate because of hits
+
+
+def enabled():
+    return db_path.upper() != "NONE"
+
+
+def normalize(line):
+    # Same line with different spaces shares the translation
+    return " ".join(line.split())
+
+
+def connect():
+    global db
+    if db is None:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS tm (
+                      source_lang TEXT, target_lang TEXT, line TEXT, translation TEXT,
+                      PRIMARY KEY (source_lang, target_lang, line))""")
+        db.commit()
+    return db
+
+
+def lookup(lines, source_lang, target_lang):
+    """
+    Look up lines in bulk, return dict of normalized line: translation for the hits
+    """
+    global lookup_lines, hit_lines, hit_chars
+    keys = list({normalize(line) for line in lines})
+    found = {}
+    with db_lock:
+        conn = connect()
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = conn.execute(
+                f"SELECT line, translation FROM tm WHERE source_lang=? AND target_lang=? "
+                f"AND line IN ({','.join('?' * len(batch))})",
+                [source_lang, target_lang] + batch)
+            found.update(rows.fetchall())
+        for line in lines:
+            key = normalize(line)
+            lookup_lines += 1
+            if key in found:
+                hit_lines += 1
+                hit_chars += len(key)
+    return found
+
+
+def store(translations, source_lang, target_lang):
+    # Write back dict of normalized line: translation
+    with db_lock:
+        conn = connect()
+        conn.executemany("INSERT OR REPLACE INTO tm (source_lang, target_lang, line, translation) VALUES (?, ?, ?, ?)",
+                         [(source_lang, target_lang, line, t) for line, t in translations.items()])
+        conn.commit()
+
+
+def report():
+    if not enabled() or lookup_lines == 0:
+        return
+    print(f"Translation memory hit rate: {hit_lines / lookup_lines:.1%} ({hit_lines}/{lookup_lines} lines), "
+          f"{hit_chars} characters not sent to translate")
@@ -10,29 +10,26 @@ def load_srt(filename):
     return list(srt.parse(text))
 
 
-def update_srt(langfile, subs):
-    # change subtitles' content to translated lines
-
-    with open(langfile, encoding="utf8") as f:
-        lines = f.readlines()
-    i = 0
-    for line in lines:
-        subs[i].content = line
-        i += 1
-    return subs
-
-
-def write_srt(lang, lang_subs, out_file):
-    filename = f"{out_file}.{lang}.srt"
-    f = open(filename, "w", encoding="utf8")
-    f.write(srt.compose(lang_subs, strict=True))
-    f.close()
-    print("Wrote SRT file {}".format(filename))
-    return
-
-
-def txt2srt(orgfile, langfile, lang, out_file):
-    subs = load_srt(orgfile)
-    lang_subs = update_srt(langfile, subs)
-    write_srt(lang, lang_subs, out_file)
-    return
\ No newline at end of file
+def update_srt(subs, lines):
+    # CueList of the same cues with translated lines as content, the time arrays are shared
+    return subs.with_texts(lines)
+
+
+def write_subs(lang, lang_subs, out_file, formats):
+    # Write every format in formats, e.g. ["srt", "vtt", "ass", "ttml"], in one pass over the cues
+    filenames = {fmt: f"{out_file}.{lang}.{fmt}" for fmt in formats}
+    files = {fmt: open(filename, "w", encoding="utf8") for fmt, filename in filenames.items()}
+    try:
+        lang_subs.write_formats(files, lang)
+    finally:
+        for f in files.values():
+            f.close()
+    print("Wrote subtitle files {}".format(", ".join(filenames.values())))
+    return list(filenames.values())
+
+
+def txt2srt(subs, lines, lang, out_file, formats=("srt",)):
+    # Merge translated lines into the cues of recognition in memory, and write the subtitles of lang
+    # Return list of the written files
+    lang_subs = update_srt(subs, lines)
+    return write_subs(lang, lang_subs, out_file, formats)